@@ -9,6 +9,19 @@ class BlazingException(Exception):
     """ Base class for all BlazingDB exceptions """
 
 
+class ChunkLoadException(BlazingException):
+    """ Thrown when one or more chunks of a table fail to load into BlazingDB """
+
+    def __init__(self, table, failures):
+        super(ChunkLoadException, self).__init__()
+        self.table = table
+        self.failures = failures
+
+    def __str__(self):
+        file_paths = ", ".join(file_path for file_path, _ in self.failures)
+        return "table={0}, chunks=[{1}]".format(self.table, file_paths)
+
+
 class ConnectionFailedException(BlazingException):
     """ Thown when something goes wrong attempting to connect to BlazingDB """
 
@@ -44,6 +57,19 @@ class PipelineException(BlazingException):
     """ Thrown when an exception occurs while processing pipeline stages """
 
 
+class ResultsDecodeException(BlazingException):
+    """ Thrown when a response from BlazingDB cannot be decoded """
+
+    def __init__(self, position, response):
+        super(ResultsDecodeException, self).__init__()
+        self.position = position
+        self.response = response
+
+    def __str__(self):
+        response_message = textwrap.shorten(self.response, 100)
+        return "position={0}, response='{1}'".format(self.position, response_message)
+
+
 class RetryException(BlazingException):
     """ Thrown when an attempt to forward a message fails too many times """
 
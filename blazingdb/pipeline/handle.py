@@ -13,6 +13,7 @@ class Handle(object):
 
         self.children = [] if track_children else None
         self.future = loop.create_future()
+        self.failed = False
         self.parent = parent
         self.loop = loop
 
@@ -38,6 +39,13 @@ class Handle(object):
         self.add_child(handle)
         return handle
 
+    def fail(self):
+        """ Marks the handle, and all of its parents, as having failed """
+        self.failed = True
+
+        if self.parent is not None:
+            self.parent.fail()
+
     def complete(self):
         self.future.set_result(None)
 
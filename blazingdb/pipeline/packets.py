@@ -18,8 +18,20 @@ class DataCompletePacket(Packet):
 
 class DataFilePacket(Packet):
     """ Packet describing a chunk of data in a file to be loaded """
-    def __init__(self, file_path):
+    def __init__(self, file_path, index=None, rows=None, size=None, **kwargs):
         self.file_path = file_path
+        self.index = index
+        self.rows = rows
+        self.size = size
+
+        # Recorded while writing the file, so it need not be read again when loading it
+        self.checksum = kwargs.get("checksum", None)
+        self.trailing_empty = kwargs.get("trailing_empty", None)
+
+class DataFilterPacket(Packet):
+    """ Packet describing a predicate the rows retrieved from the source must match """
+    def __init__(self, predicate):
+        self.predicate = predicate
 
 class DataFormatPacket(Packet):
     """ Packet describing the format of a chunk of data """
@@ -50,3 +62,10 @@ class ImportTablePacket(Packet):
     def __init__(self, source, table):
         self.source = source
         self.table = table
+
+class WatermarkPacket(Packet):
+    """ Packet describing the range of a watermark column to import """
+    def __init__(self, column, low, high):
+        self.column = column
+        self.low = low
+        self.high = high
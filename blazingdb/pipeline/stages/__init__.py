@@ -7,9 +7,16 @@ from .base import BaseStage, PipelineStage, When
 from .batch import BatchStage
 from .custom import CustomActionStage
 from .database import CreateTableStage, DropTableStage, SourceComparisonStage, TruncateTableStage
+from .export import CopyExportStage
+from .extract import ExtractionStage
+from .incremental import IncrementalImportStage
 from .load import FileImportStage, FileOutputStage
-from .misc import DelayStage, InjectPacketStage, PromptInputStage, SingleFileStage, SkipTableStage
-from .unload import UnloadGenerationStage, UnloadRetrievalStage
+from .misc import DelayStage, FilterColumnsStage, InjectPacketStage, PromptInputStage
+from .misc import SingleFileStage, SkipTableStage
+from .unload import UnloadGenerationStage, UnloadOutputStage, UnloadRetrievalStage
 
 
-__all__ = ["base", "batch", "custom", "database", "load", "misc", "unload"]
+__all__ = [
+    "base", "batch", "custom", "database", "export", "extract", "incremental", "load", "misc",
+    "unload"
+]
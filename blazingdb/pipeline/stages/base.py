@@ -32,6 +32,10 @@ class BaseStage(object, metaclass=abc.ABCMeta):
                 await self.process(message)
             else:
                 await message.forward()
+        except Exception:
+            message.handle.fail()
+
+            raise
         finally:
             if not message.handle.cancelled():
                 message.complete()
@@ -2,115 +2,345 @@
 Defines the base batcher class for generating batches of data to load into BlazingDB
 """
 
-import gc
+import asyncio
+import collections
 import logging
+import math
+import time
 
 import pandas
 
+from blazingdb.util.timer import RepeatedTimer
+
 from . import base
 from .. import packets
 
 
 # pragma pylint: disable=too-few-public-methods
 
+class FrameBuffer(object):
+    """ Buffers frames with their sizes, cutting them into batches of a given size / row count """
+
+    # pragma pylint: disable=too-many-instance-attributes
+
+    def __init__(self, batch_size, max_rows=None):
+        self.batch_size = batch_size
+        self.max_rows = max_rows
+
+        self.frames = collections.deque()
+        self.size = 0
+        self.rows = 0
+        self.index = 0
+
+        self.message = None
+        self.placeholder = None
+
+    def append(self, frame, size):
+        """ Adds a frame of the given size in bytes to the buffer """
+        self.frames.append((frame, size, time.monotonic()))
+        self.size += size
+        self.rows += frame.shape[0]
+
+    def oldest(self):
+        """ Retrieves the time the oldest frame in the buffer arrived, or None if it is empty """
+        return self.frames[0][2] if self.frames else None
+
+    def _is_full(self):
+        if self.batch_size is not None and self.size >= self.batch_size:
+            return True
+
+        return self.max_rows is not None and self.rows >= self.max_rows
+
+    def _take(self, target_size, target_rows):
+        """ Removes frames up to the target bytes or rows, splitting the last frame if needed """
+        pieces = []
+        taken_size = taken_rows = 0
+
+        target_size = target_size if target_size is not None else math.inf
+        target_rows = target_rows if target_rows is not None else math.inf
+
+        while self.frames and taken_size < target_size and taken_rows < target_rows:
+            frame, size, arrived = self.frames[0]
+            row_count = frame.shape[0]
+
+            if row_count == 0 or (taken_size + size <= target_size
+                                  and taken_rows + row_count <= target_rows):
+                pieces.append(frame)
+
+                taken_size += size
+                taken_rows += row_count
+
+                self.frames.popleft()
+                continue
+
+            row_size = size / row_count
+
+            size_rows = row_count
+            if row_size and target_size != math.inf:
+                size_rows = int((target_size - taken_size) / row_size)
+
+            # Always take at least one row, so a batch is never empty
+            batch_rows = min(size_rows, target_rows - taken_rows)
+
+            batch_rows = max(batch_rows, 0 if pieces else 1)
+            if batch_rows == 0:
+                break
+
+            pieces.append(frame.iloc[:batch_rows])
+
+            taken_size += batch_rows * row_size
+            taken_rows += batch_rows
+
+            if batch_rows < row_count:
+                remaining_size = size - batch_rows * row_size
+                self.frames[0] = (frame.iloc[batch_rows:], remaining_size, arrived)
+            else:
+                self.frames.popleft()
+
+        self.size -= taken_size
+        self.rows -= taken_rows
+
+        return pieces
+
+    def _build_batch(self, pieces):
+        frame = pieces[0] if len(pieces) == 1 else pandas.concat(pieces)
+
+        batch = (frame, self.index)
+        self.index += 1
+
+        return batch
+
+    def batches(self):
+        """ Generates batches while the buffer holds at least batch_size bytes or max_rows rows """
+        while self.frames and self._is_full():
+            yield self._build_batch(self._take(self.batch_size, self.max_rows))
+
+    def flush(self):
+        """ Removes all frames from the buffer as a single batch, or None if it is empty """
+        if not self.frames:
+            return None
+
+        pieces = [frame for frame, _, _ in self.frames]
+
+        self.frames.clear()
+        self.size = self.rows = 0
+
+        return self._build_batch(pieces)
+
+    def release(self):
+        """ Stops tracking the buffered rows, returning the message and handle tracking them """
+        message, placeholder = self.message, self.placeholder
+        self.message = self.placeholder = None
+
+        return message, placeholder
+
+
+class FrameSizer(object):
+    """ Estimates the serialized size of frames from sampled rows, cached per table schema """
+
+    DEFAULT_SAMPLE_ROWS = 100
+    DEFAULT_SAMPLE_FRAMES = 10
+
+    def __init__(self, **kwargs):
+        self.sample_rows = kwargs.get("sample_rows", self.DEFAULT_SAMPLE_ROWS)
+        self.sample_frames = kwargs.get("sample_frames", self.DEFAULT_SAMPLE_FRAMES)
+
+        self.estimates = dict()
+
+    def _sample(self, frame):
+        """ Measures the serialized bytes of rows spread evenly through the frame """
+        row_count = frame.shape[0]
+        sample = frame.iloc[::max(row_count // self.sample_rows, 1)].iloc[:self.sample_rows]
+
+        # Serializing the sample measures the real length of object columns, not their pointers
+        data = sample.to_csv(header=False, index=False)
+        return len(data.encode("utf-8")), sample.shape[0]
+
+    def measure(self, table, frame):
+        """ Estimates the size in bytes of the frame once written to a file """
+        if frame.empty:
+            return 0
+
+        schema = (table, tuple(zip(frame.columns, frame.dtypes)))
+        estimate = self.estimates.get(schema)
+
+        # Refine the estimate from the first few frames of each schema, then reuse it
+        if estimate is None or estimate[2] < self.sample_frames:
+            sample_bytes, sample_rows = self._sample(frame)
+            total_bytes, total_rows, frames = estimate or (0, 0, 0)
+
+            estimate = (total_bytes + sample_bytes, total_rows + sample_rows, frames + 1)
+            self.estimates[schema] = estimate
+
+        total_bytes, total_rows, _ = estimate
+        return int(frame.shape[0] * total_bytes / total_rows)
+
+
 class BatchStage(base.BaseStage):
     """ Handles performing requests to load data into Blazing """
 
+    # pragma pylint: disable=too-many-instance-attributes
+
     DEFAULT_LOG_INTERVAL = 10
+    DEFAULT_SIZING = "memory"
+
+    SIZING_MODES = ["memory", "serialized"]
 
-    def __init__(self, batch_size):
+    # The fraction of max_latency between checks for buffers which have waited too long
+    LATENCY_CHECK_RATIO = 0.25
+
+    def __init__(self, batch_size=None, loop=None, **kwargs):
         super(BatchStage, self).__init__(packets.DataFramePacket, packets.DataCompletePacket)
         self.logger = logging.getLogger(__name__)
+        self.loop = loop
 
         self.batch_size = batch_size
-        self.generators = dict()
+        self.max_rows = kwargs.get("max_rows", None)
+        self.max_latency = kwargs.get("max_latency", None)
+
+        if self.batch_size is None and self.max_rows is None:
+            raise ValueError("BatchStage requires at least one of batch_size or max_rows")
+
+        self.buffers = dict()
+        self.timer = None
+
+        self.sizing = kwargs.get("sizing", self.DEFAULT_SIZING)
+        if self.sizing not in self.SIZING_MODES:
+            raise ValueError("Unknown sizing mode, {0}".format(self.sizing))
+
+        self.sizer = FrameSizer(**kwargs)
 
     async def shutdown(self):
-        for gen in self.generators.values():
-            gen.close()
+        if self.timer is not None and self.timer.is_running:
+            self.timer.stop()
 
-    def _generate_batch(self):
-        frame_data = yield
+        for buffer in self.buffers.values():
+            batch = buffer.flush()
+            message, placeholder = buffer.release()
 
-        index = 0
-        while True:
-            while True:
-                memory_usage = frame_data.memory_usage().sum()
-                row_count = frame_data.shape[0]
+            if message is not None and batch is not None:
+                await message.forward(packets.DataFramePacket(*batch))
 
-                if memory_usage < self.batch_size:
-                    break
+            if placeholder is not None:
+                placeholder.complete()
 
-                batch_ratio = self.batch_size / memory_usage
-                batch_rows = int(batch_ratio * row_count)
+        self.buffers.clear()
 
-                batch_frame = frame_data.iloc[:batch_rows].copy()
-                frame_data = frame_data.iloc[batch_rows:]
+    def _measure_frame(self, message, frame):
+        if self.sizing == "memory":
+            return frame.memory_usage(index=False).sum()
 
-                yield batch_frame, index
+        import_pkt = message.get_packet(packets.ImportTablePacket, default=None)
+        table = import_pkt.table if import_pkt is not None else None
 
-                index += 1
+        return self.sizer.measure(table, frame)
 
-            # Free up memory by shrinking the frame_data and collecting the old frame
-            frame_data = frame_data.copy()
-            gc.collect()
+    def _get_buffer(self, msg_id):
+        if msg_id not in self.buffers:
+            self.buffers[msg_id] = FrameBuffer(self.batch_size, self.max_rows)
 
-            next_frame = yield
+        return self.buffers[msg_id]
 
-            if next_frame is None:
-                break
+    @staticmethod
+    def _create_placeholder(message):
+        """ Creates a handle tracking buffered rows, above the handle tracking their frames """
+        handle = message.handle
+        while handle is not None and handle.children is None:
+            handle = handle.parent
+
+        # Producers wait on their frames before sending a DataCompletePacket, so the rows are
+        # tracked by the stream instead, which is only complete once they have been forwarded
+        if handle is None or handle.parent is None:
+            return None
+
+        return handle.parent.create_child()
+
+    def _track_rows(self, message, buffer):
+        """ Tracks the rows a message left in the buffer, until they are flushed by max_latency """
+        buffer.message = message
+
+        if buffer.placeholder is None:
+            buffer.placeholder = self._create_placeholder(message)
+
+        self._start_timer()
+
+    async def _forward_expired(self, message, placeholder, batch):
+        try:
+            handle = await message.forward(packets.DataFramePacket(*batch), track_children=True)
+            await handle
+        finally:
+            if placeholder is not None:
+                placeholder.complete()
+
+    def _flush_expired(self):
+        """ Flushes buffers whose oldest rows have waited longer than max_latency """
+        expiry = time.monotonic() - self.max_latency
 
-            frame_data = pandas.concat(
-                [frame_data, next_frame])
+        for msg_id, buffer in self.buffers.items():
+            oldest = buffer.oldest()
 
-        yield frame_data, index
+            if buffer.message is not None and oldest is not None and oldest <= expiry:
+                self.logger.debug("Flushing rows of message %s after %ss", msg_id, self.max_latency)
 
-    def _get_generator(self, msg_id):
-        if msg_id in self.generators:
-            return self.generators[msg_id]
+                message, placeholder = buffer.release()
+                asyncio.ensure_future(self._forward_expired(
+                    message, placeholder, buffer.flush()), loop=self.loop)
 
-        generator = self._generate_batch()
-        generator.send(None)
+        self._stop_timer()
 
-        self.generators[msg_id] = generator
-        return generator
+    def _start_timer(self):
+        if self.timer is None:
+            self.timer = RepeatedTimer(self.max_latency * self.LATENCY_CHECK_RATIO,
+                self._flush_expired, loop=self.loop)
 
-    def _delete_generator(self, msg_id):
-        generator = self.generators.pop(msg_id)
-        generator.close()
+        self.timer.start()
+
+    def _stop_timer(self):
+        """ Stops the timer once no buffer holds rows waiting to be flushed by max_latency """
+        if self.timer is None or not self.timer.is_running:
+            return
+
+        if not any(buffer.message is not None for buffer in self.buffers.values()):
+            self.timer.stop()
 
     async def process(self, message):
         """ Generates a series of batches from the stream """
-        generator = self._get_generator(message.initial_id)
+        buffer = self._get_buffer(message.initial_id)
 
         frame_packets = []
         for packet in message.pop_packets(packets.DataFramePacket):
-            batch = generator.send(packet.frame)
-
-            while batch is not None:
-                frame, index = batch
-
-                frame_packet = packets.DataFramePacket(frame, index)
-                frame_packets.append(frame_packet)
+            buffer.append(packet.frame, self._measure_frame(message, packet.frame))
 
-                batch = generator.send(None)
+            for frame, index in buffer.batches():
+                frame_packets.append(packets.DataFramePacket(frame, index))
 
         complete_packet = message.get_packet(
             packets.DataCompletePacket, default=None)
 
         if complete_packet is not None:
-            batch = generator.send(None)
+            batch = buffer.flush()
 
-            if batch:
+            if batch is not None:
                 frame, index = batch
+                frame_packets.append(packets.DataFramePacket(frame, index))
 
-                frame_packet = packets.DataFramePacket(frame, index)
-                frame_packets.append(frame_packet)
-
-            self._delete_generator(message.initial_id)
+            del self.buffers[message.initial_id]
 
         if frame_packets:
             self.logger.info("Created %s segments of data from message %s",
                 len(frame_packets), message.msg_id)
 
+        # The DataCompletePacket is always forwarded, even when no rows were left to flush
+        if frame_packets or complete_packet is not None:
             await message.forward(*frame_packets)
+
+        if self.max_latency is not None and complete_packet is None and buffer.frames:
+            self._track_rows(message, buffer)
+            return
+
+        # Any rows tracked for an earlier message have now been forwarded by this one
+        _, placeholder = buffer.release()
+        if placeholder is not None:
+            placeholder.complete()
+
+        self._stop_timer()
@@ -5,6 +5,7 @@ Defines a series of pipeline stages for affecting database tables, including:
  - TruncateTableStage
 """
 
+import asyncio
 import logging
 
 import pandas
@@ -17,7 +18,109 @@ from .. import packets
 from ..util import get_columns
 
 
-class CreateTableStage(custom.CustomActionStage):
+class StatementBatcher(object):
+    """ Gathers statements from concurrent messages and executes them against a destination """
+
+    DEFAULT_BATCH_DELAY = 0.1
+    DEFAULT_BATCH_SIZE = 100
+
+    def __init__(self, loop=None, **kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.batch_delay = kwargs.get("batch_delay", self.DEFAULT_BATCH_DELAY)
+        self.batch_size = kwargs.get("batch_size", self.DEFAULT_BATCH_SIZE)
+
+        self.handles = dict()
+        self.pending = dict()
+        self.tasks = set()
+
+    async def _execute_batch(self, destination, pending):
+        queries = [query for query, _ in pending]
+        self.logger.debug("Executing batch of %s statement(s)", len(queries))
+
+        try:
+            errors = await destination.execute_many(queries)
+        except Exception as ex:  # pylint: disable=broad-except
+            errors = [ex] * len(queries)
+
+        for (_, future), error in zip(pending, errors):
+            if future.done():
+                continue
+
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    def _flush(self, destination):
+        """ Begins executing all pending statements for the given destination """
+        handle = self.handles.pop(destination, None)
+        if handle is not None:
+            handle.cancel()
+
+        pending = self.pending.pop(destination, None)
+        if not pending:
+            return
+
+        task = asyncio.ensure_future(self._execute_batch(destination, pending), loop=self.loop)
+        task.add_done_callback(self.tasks.discard)
+
+        self.tasks.add(task)
+
+    async def execute(self, destination, query):
+        """ Queues a statement to be executed in the next batch, waiting for it to complete """
+        future = self.loop.create_future()
+
+        pending = self.pending.setdefault(destination, [])
+        pending.append((query, future))
+
+        if len(pending) >= self.batch_size:
+            self._flush(destination)
+        elif destination not in self.handles:
+            self.handles[destination] = self.loop.call_later(
+                self.batch_delay, self._flush, destination)
+
+        await future
+
+    async def shutdown(self):
+        """ Executes any pending statements and waits for running batches to complete """
+        for destination in list(self.pending):
+            self._flush(destination)
+
+        if self.tasks:
+            await asyncio.wait(self.tasks, loop=self.loop)
+
+
+class DatabaseStage(custom.CustomActionStage):
+    """ Base class for stages executing statements against the destination """
+
+    def __init__(self, callback, *packet_types, **kwargs):
+        super(DatabaseStage, self).__init__(callback, *packet_types, **kwargs)
+
+        self.batcher = None
+        if kwargs.get("batch", False):
+            self.batcher = StatementBatcher(**kwargs)
+
+    async def _execute(self, destination, query):
+        """ Executes a statement, gathering it into a batch if batching is enabled """
+        if self.batcher is None:
+            return await destination.execute(query)
+
+        return await self.batcher.execute(destination, query)
+
+    @staticmethod
+    def _is_appending(message):
+        """ Checks if the message is appending rows to a table imported previously """
+        watermark_pkt = message.get_packet(packets.WatermarkPacket, default=None)
+        return watermark_pkt is not None and watermark_pkt.low is not None
+
+    async def shutdown(self):
+        if self.batcher is not None:
+            await self.batcher.shutdown()
+
+
+class CreateTableStage(DatabaseStage):
     """ Creates the destination table before importing data """
 
     def __init__(self, **kwargs):
@@ -27,8 +130,7 @@ class CreateTableStage(custom.CustomActionStage):
         self.logger = logging.getLogger(__name__)
         self.quiet = kwargs.get("quiet", False)
 
-    @staticmethod
-    async def _perform_query(destination, table, columns):
+    async def _perform_query(self, destination, table, columns):
         query_columns = ", ".join([
             "{0} {1}".format(column.name, build_datatype(column))
             for column in columns
@@ -37,7 +139,7 @@ class CreateTableStage(custom.CustomActionStage):
         identifier = destination.get_identifier(table)
         query = "CREATE TABLE {0} ({1})".format(identifier, query_columns)
 
-        await destination.execute(query)
+        await self._execute(destination, query)
 
     async def _create_table(self, message):
         """ Triggers the creation of the destination table """
@@ -46,6 +148,11 @@ class CreateTableStage(custom.CustomActionStage):
 
         table = import_pkt.table
         destination = dest_pkt.destination
+
+        if self._is_appending(message):
+            self.logger.debug("Skipping creation of table %s as rows are being appended", table)
+            return
+
         columns = await get_columns(message, add_if_missing=True)
 
         self.logger.info("Creating table %s with %s column(s)", table, len(columns))
@@ -62,9 +169,11 @@ class CreateTableStage(custom.CustomActionStage):
             ]), table)
 
             self.logger.debug(ex.response)
+        finally:
+            destination.invalidate_metadata(table)
 
 
-class DropTableStage(custom.CustomActionStage):
+class DropTableStage(DatabaseStage):
     """ Drops the destination table before importing data """
 
     def __init__(self, **kwargs):
@@ -81,12 +190,17 @@ class DropTableStage(custom.CustomActionStage):
 
         table = import_pkt.table
         destination = dest_pkt.destination
+
+        if self._is_appending(message):
+            self.logger.debug("Skipping dropping of table %s as rows are being appended", table)
+            return
+
         identifier = destination.get_identifier(table)
 
         self.logger.info("Dropping table %s", table)
 
         try:
-            await destination.execute("DROP TABLE {0}".format(identifier))
+            await self._execute(destination, "DROP TABLE {0}".format(identifier))
         except exceptions.QueryException as ex:
             if not self.quiet:
                 raise
@@ -97,6 +211,8 @@ class DropTableStage(custom.CustomActionStage):
             ]), table)
 
             self.logger.debug(ex.response)
+        finally:
+            destination.invalidate_metadata(table)
 
 
 class SourceComparisonStage(custom.CustomActionStage):
@@ -160,7 +276,7 @@ class SourceComparisonStage(custom.CustomActionStage):
         self.logger.debug("Destination:\n %s", dest_results)
 
 
-class TruncateTableStage(custom.CustomActionStage):
+class TruncateTableStage(DatabaseStage):
     """ Deletes all rows in the destination table before importing data """
 
     def __init__(self, **kwargs):
@@ -177,12 +293,17 @@ class TruncateTableStage(custom.CustomActionStage):
 
         table = import_pkt.table
         destination = dest_pkt.destination
+
+        if self._is_appending(message):
+            self.logger.debug("Skipping truncation of table %s as rows are being appended", table)
+            return
+
         identifier = destination.get_identifier(table)
 
         self.logger.info("Truncating table %s", table)
 
         try:
-            await destination.execute("DELETE FROM {0}".format(identifier))
+            await self._execute(destination, "DELETE FROM {0}".format(identifier))
         except exceptions.QueryException as ex:
             if not self.quiet:
                 raise
@@ -0,0 +1,191 @@
+"""
+Defines the stages for exporting data from a source directly into chunk files
+"""
+
+import asyncio
+import logging
+import os.path
+import re
+
+import aiofiles
+
+from blazingdb import exceptions
+
+from . import load
+from .. import packets
+from ..util import get_columns, get_predicate
+
+
+class ChunkFileOutput(object):
+    """ Writes a stream of rows into a series of files, rotating them at a given size """
+
+    # pragma pylint: disable=too-many-instance-attributes
+
+    DEFAULT_FIELD_WRAPPER = "\""
+    DEFAULT_ESCAPE_CHAR = "\\"
+
+    def __init__(self, get_file_path, file_size, line_terminator, callback, loop=None, **kwargs):
+        # pragma pylint: disable=too-many-arguments
+        self.loop = loop
+
+        self.callback = callback
+        self.get_file_path = get_file_path
+
+        self.file_size = file_size
+        self.line_terminator = line_terminator.encode()
+
+        wrapper = re.escape(kwargs.get("field_wrapper", self.DEFAULT_FIELD_WRAPPER).encode())
+        escape = re.escape(kwargs.get("escape_char", self.DEFAULT_ESCAPE_CHAR).encode())
+        terminator = re.escape(self.line_terminator)
+
+        # Quoted fields may contain line terminators, so match them whole when finding records
+        plain = b"".join([b"[^", wrapper, escape, b"]*"])
+        quoted = b"".join([wrapper, plain, b"(?:", escape, b".", plain, b")*", wrapper])
+        unquoted = b"".join([b"[^", wrapper, terminator, b"]*"])
+
+        self.quoted_pattern = re.compile(quoted, re.DOTALL)
+        self.records_pattern = re.compile(b"".join(
+            [b"(?:", unquoted, b"(?:", quoted, unquoted, b")*", terminator, b")*"]), re.DOTALL)
+
+        self.data_file = None
+        self.file_path = None
+        self.partial = b""
+
+        self.written = 0
+        self.rows = 0
+        self.index = 0
+
+    def _count_rows(self, data):
+        """ Counts the records in the data, ignoring line terminators within quoted fields """
+        return self.quoted_pattern.sub(b"", data).count(self.line_terminator)
+
+    async def _open(self):
+        self.file_path = self.get_file_path(self.index)
+        self.data_file = await aiofiles.open(self.file_path, "wb", loop=self.loop)
+
+    async def _rotate(self):
+        await self.data_file.close()
+        await self.callback(self.file_path, self.index, self.rows, self.written)
+
+        self.data_file = None
+        self.written = 0
+        self.rows = 0
+        self.index += 1
+
+    async def _write_records(self, data, rows):
+        if self.data_file is None:
+            await self._open()
+
+        await self.data_file.write(data)
+
+        self.written += len(data)
+        self.rows += rows
+
+    async def write(self, data):
+        """ Writes a block of data, rotating the file at the first record boundary past the size """
+        data = self.partial + data
+
+        # Only whole records are written, so a file is never rotated within a quoted field
+        split = self.records_pattern.match(data).end()
+        self.partial = data[split:]
+
+        if split == 0:
+            return
+
+        await self._write_records(data[:split], self._count_rows(data[:split]))
+
+        if self.written >= self.file_size:
+            await self._rotate()
+
+    async def close(self):
+        """ Closes the current file, if any data has been written into it """
+        if self.partial:
+            await self._write_records(self.partial, 1)
+            self.partial = b""
+
+        if self.data_file is not None:
+            await self._rotate()
+
+
+class CopyExportStage(load.ChunkFileStage):
+    """ Exports tables from Postgres with COPY, writing the output straight into chunk files """
+
+    DEFAULT_FILE_SIZE = 256 * 1024 * 1024
+    DEFAULT_ESCAPE_CHAR = "\\"
+
+    COLUMN_CASTS = {
+        "bool": "CASE WHEN {0} THEN 'True' WHEN NOT {0} THEN 'False' END",
+        "datetime": "{0}::date"
+    }
+
+    def __init__(self, upload_folder, user, loop=None, **kwargs):
+        super(CopyExportStage, self).__init__(
+            upload_folder, user, packets.ImportTablePacket, loop=loop, **kwargs)
+
+        self.logger = logging.getLogger(__name__)
+        self.file_size = kwargs.get("file_size", self.DEFAULT_FILE_SIZE)
+
+    def _build_query(self, source, table, columns, predicate=None):
+        """ Builds a query selecting columns formatted the same way as write_frame """
+        def _format_column(column):
+            cast = self.COLUMN_CASTS.get(column.type)
+            if cast is None:
+                return column.name
+
+            return "{0} AS {1}".format(cast.format(column.name), column.name)
+
+        query = "SELECT {0} FROM {1}".format(
+            ", ".join(_format_column(column) for column in columns),
+            source.get_identifier(table))
+
+        if predicate is not None:
+            query = "{0} WHERE {1}".format(query, predicate)
+
+        return query
+
+    async def process(self, message):
+        import_pkt = message.get_packet(packets.ImportTablePacket)
+        format_pkt = message.get_packet(packets.DataFormatPacket,
+            default=self.format_pkt, add_if_missing=True)
+
+        if format_pkt.line_terminator != "\n":
+            raise exceptions.PipelineException("COPY only supports a line terminator of '\\n'")
+
+        source = import_pkt.source
+        table = import_pkt.table
+
+        columns = await get_columns(message, add_if_missing=True)
+        query = self._build_query(source, table, columns, get_predicate(message))
+
+        handles = []
+
+        async def _forward_file(file_path, index, rows, size):
+            relative_path = os.path.relpath(file_path, self.upload_folder)
+            self.logger.info("Exported chunk file: %s", relative_path)
+
+            file_pkt = packets.DataFilePacket(file_path, index, rows=rows, size=size)
+            self._register_file(file_pkt)
+
+            handles.append(await message.forward(file_pkt, track_children=True))
+
+            # Pauses reading from COPY until the disk budget allows another file
+            await self._acquire_budget()
+
+        output = ChunkFileOutput(lambda index: self._get_file_path(table, index),
+            self.file_size, format_pkt.line_terminator, _forward_file, loop=self.loop,
+            field_wrapper=format_pkt.field_wrapper, escape_char=self.DEFAULT_ESCAPE_CHAR)
+
+        self.logger.debug("Exporting data from Postgres with query, %s", query)
+
+        try:
+            await source.copy_query(query, output.write, format="csv",
+                delimiter=format_pkt.field_terminator, quote=format_pkt.field_wrapper,
+                escape=self.DEFAULT_ESCAPE_CHAR, null="", encoding=self.encoding,
+                force_quote=[column.name for column in columns if column.type == "str"])
+        finally:
+            await output.close()
+
+        if handles:
+            await asyncio.wait(handles, loop=self.loop)
+
+        await message.forward(packets.DataCompletePacket())
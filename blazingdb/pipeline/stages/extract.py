@@ -0,0 +1,57 @@
+"""
+Defines the stages for extracting data for a table from its source
+"""
+
+import asyncio
+import logging
+
+from . import base
+from .. import packets
+from ..util import get_columns, get_predicate
+
+
+class ExtractionStage(base.BaseStage):
+    """ Retrieves the rows of a table from its source as a stream of DataFramePackets """
+
+    DEFAULT_PARTITIONS = 1
+
+    def __init__(self, loop=None, **kwargs):
+        super(ExtractionStage, self).__init__(packets.ImportTablePacket)
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop
+
+        self.partitions = kwargs.get("partitions", self.DEFAULT_PARTITIONS)
+        self.partition_keys = kwargs.get("partition_keys", dict())
+
+    async def process(self, message):
+        import_pkt = message.get_packet(packets.ImportTablePacket)
+
+        source = import_pkt.source
+        table = import_pkt.table
+
+        columns = await get_columns(message, add_if_missing=True)
+        key = self.partition_keys.get(table)
+        predicate = get_predicate(message)
+
+        self.logger.info("Extracting table %s in %s partition(s)", table, self.partitions)
+
+        pending = []
+        frames = source.query_partitions(
+            table, columns, self.partitions, key=key, predicate=predicate)
+
+        async for index, (_, frame) in _enumerate(frames):
+            frame_pkt = packets.DataFramePacket(frame, index)
+            pending.append(await message.forward(frame_pkt, track_children=True))
+
+        if pending:
+            await asyncio.wait(pending, loop=self.loop)
+
+        await message.forward(packets.DataCompletePacket())
+
+
+async def _enumerate(iterable):
+    index = 0
+
+    async for item in iterable:
+        yield index, item
+        index += 1
@@ -0,0 +1,70 @@
+"""
+Defines the IncrementalImportStage for only importing rows added since the previous import
+"""
+
+import logging
+
+from blazingdb.util.state import normalize_value
+
+from . import base
+from .. import packets
+
+
+class IncrementalImportStage(base.BaseStage):
+    """ Restricts imports to rows past the watermark stored for each table """
+
+    DEFAULT_COLUMN = None
+
+    def __init__(self, store, **kwargs):
+        super(IncrementalImportStage, self).__init__(packets.ImportTablePacket)
+        self.logger = logging.getLogger(__name__)
+        self.store = store
+
+        self.columns = kwargs.get("columns", dict())
+        self.default_column = kwargs.get("default_column", self.DEFAULT_COLUMN)
+
+    @staticmethod
+    async def _get_high_watermark(source, table, column):
+        query = "SELECT max({0}) FROM {1}".format(column, source.get_identifier(table))
+
+        # Read as a single value, so the offset of timestamptz watermarks is kept
+        return normalize_value(await source.query_value(query))
+
+    async def process(self, message):
+        import_pkt = message.get_packet(packets.ImportTablePacket)
+
+        source = import_pkt.source
+        table = import_pkt.table
+
+        column = self.columns.get(table, self.default_column)
+        if column is None:
+            await message.forward()
+            return
+
+        low = await self.store.get_watermark(table)
+        high = await self._get_high_watermark(source, table, column)
+
+        if low is not None and (high is None or high <= low):
+            self.logger.info("Skipping table %s as it has no rows past %s", table, low)
+            return
+
+        # The first import of an empty table still creates it, but has no watermark to store
+        if high is None:
+            self.logger.info("Importing table %s in full as %s has no values", table, column)
+
+            await message.forward()
+            return
+
+        self.logger.info("Importing rows of table %s where %s is in (%s, %s]",
+            table, column, low, high)
+
+        message.add_packet(packets.WatermarkPacket(column, low, high))
+        handle = await message.forward(track_children=True)
+
+        await handle
+
+        if handle.failed:
+            self.logger.warning("Import of table %s failed, keeping watermark %s", table, low)
+            return
+
+        await self.store.set_watermark(table, high)
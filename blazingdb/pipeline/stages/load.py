@@ -3,7 +3,7 @@ Defines the importing stages of the pipeline
 """
 
 import abc
-import csv
+import asyncio
 import logging
 import os
 import os.path
@@ -13,6 +13,8 @@ import async_timeout
 
 from blazingdb import exceptions
 from blazingdb.util import process
+from blazingdb.util.serialize import FileMetadata, FrameSerializer
+from blazingdb.util.shared import SharedFrame
 
 from . import base
 from .. import packets
@@ -20,21 +22,40 @@ from .. import packets
 
 BLAZING_DATE_FORMAT = "%Y-%m-%d"
 
-def write_frame(frame, file_path, format_pkt):
-    """ Writes a data frame to disk """
-    import gc
+WRITE_BUFFER_SIZE = 1024 * 1024
 
-    def _escape_backslash(item):
-        return item.replace("\\", "\\\\") if isinstance(item, str) else item
+FRAME_SERIALIZERS = dict()
 
-    for name in frame.select_dtypes(include=["object"]).columns:
-        frame[name] = frame[name].apply(_escape_backslash)
+def write_frame(frame, file_path, format_pkt, append=False, metadata=None):
+    """ Writes a data frame to disk, returning the metadata of the file written """
+    key = (format_pkt.field_terminator, format_pkt.line_terminator, format_pkt.field_wrapper)
 
-    gc.collect()
-    frame.to_csv(file_path, sep=format_pkt.field_terminator,
-        line_terminator=format_pkt.line_terminator, quotechar=format_pkt.field_wrapper,
-        quoting=csv.QUOTE_MINIMAL, doublequote=False, escapechar="\\",
-        header=False, index=False, date_format=BLAZING_DATE_FORMAT)
+    if key not in FRAME_SERIALIZERS:
+        FRAME_SERIALIZERS[key] = FrameSerializer(*key)
+
+    # When appending, the metadata of the file so far is extended rather than replaced
+    if metadata is None or not append:
+        metadata = FileMetadata()
+
+    mode = "ab" if append else "wb"
+    with open(file_path, mode, buffering=WRITE_BUFFER_SIZE) as output:
+        for block, rows, trailing_empty in FRAME_SERIALIZERS[key].iter_blocks(frame):
+            data = block.encode("utf-8")
+
+            output.write(data)
+            metadata.update(data, rows, trailing_empty)
+
+    return metadata
+
+def write_shared_frame(handle, file_path, format_pkt, append=False, metadata=None):
+    """ Writes a data frame stored in shared memory to disk """
+    return write_frame(handle.read(), file_path, format_pkt, append, metadata)
+
+def build_file_packet(file_path, index, metadata):
+    """ Creates a DataFilePacket describing a chunk file from the metadata recorded writing it """
+    return packets.DataFilePacket(file_path, index,
+        rows=metadata.rows, size=metadata.size,
+        checksum=metadata.checksum, trailing_empty=metadata.trailing_empty)
 
 
 class BaseImportStage(base.BaseStage):
@@ -62,19 +83,77 @@ class BaseImportStage(base.BaseStage):
         pass
 
 
+def _chunk_order(file_pkt):
+    """ Sorts chunks by their index, falling back to the file path for chunks without one """
+    return (file_pkt.index is None, file_pkt.index or 0, file_pkt.file_path)
+
+
+class ChunkSequence(object):
+    """ Orders the chunks of a stream by their index, across the messages carrying them """
+
+    def __init__(self, loop=None):
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.next_index = 0
+        self.waiters = dict()
+
+    async def wait(self, index):
+        """ Waits until every chunk before the given index has been loaded """
+        while index > self.next_index:
+            if index not in self.waiters:
+                self.waiters[index] = self.loop.create_future()
+
+            await asyncio.shield(self.waiters[index], loop=self.loop)
+
+    def advance(self, index):
+        """ Marks the chunk with the given index as loaded, waking the chunk after it """
+        self.next_index = max(self.next_index, index + 1)
+
+        waiter = self.waiters.pop(self.next_index, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
 class FileImportStage(BaseImportStage):
     """ Imports chunks of data in files """
 
+    # pragma pylint: disable=too-many-instance-attributes
+
     DEFAULT_USER_FOLDER = "data"
 
+    DEFAULT_CONCURRENCY = None
+    DEFAULT_TABLE_CONCURRENCY = None
+    DEFAULT_ORDERED = False
+    DEFAULT_ERRORS = "raise"
+
+    ERROR_POLICIES = ["raise", "collect"]
+
     def __init__(self, upload_folder, user, loop=None, **kwargs):
-        super(FileImportStage, self).__init__(packets.DataFilePacket, loop=loop, **kwargs)
+        super(FileImportStage, self).__init__(
+            packets.DataFilePacket, packets.DataCompletePacket, loop=loop, **kwargs)
         self.logger = logging.getLogger(__name__)
         self.loop = loop
 
         self.ignore_skipdata = kwargs.get("ignore_skipdata", False)
         self.upload_folder = os.path.join(upload_folder, user)
 
+        self.concurrency = kwargs.get("concurrency", self.DEFAULT_CONCURRENCY)
+        self.table_concurrency = kwargs.get("table_concurrency", self.DEFAULT_TABLE_CONCURRENCY)
+        self.ordered = kwargs.get("ordered", self.DEFAULT_ORDERED)
+
+        self.errors = kwargs.get("errors", self.DEFAULT_ERRORS)
+        if self.errors not in self.ERROR_POLICIES:
+            raise ValueError("Unknown error policy, {0}".format(self.errors))
+
+        self.limit = None
+        if self.concurrency is not None:
+            self.limit = asyncio.Semaphore(self.concurrency, loop=self.loop)
+
+        self.table_limits = dict()
+        self.sequences = dict()
+
+        self.budget = kwargs.get("budget", None)
+
     def _get_import_path(self, chunk_filename):
         """ Generates a path for a given chunk of a table to be used in a query """
         relative = os.path.relpath(chunk_filename, self.upload_folder)
@@ -101,10 +180,114 @@ class FileImportStage(BaseImportStage):
             self.logger.info("Loading chunk %s into blazing", query_filename)
             await self._perform_request(destination, method, fmt, table)
         except exceptions.ServerImportWarning:
-            if not await self._should_raise_warning(packet.file_path, fmt):
+            # Only files written without metadata have to be read to check for trailing fields
+            trailing_empty = packet.trailing_empty
+            if trailing_empty is None:
+                trailing_empty = await self._should_raise_warning(packet.file_path, fmt)
+
+            if not trailing_empty:
                 raise
 
+        if self.budget is not None:
+            self.budget.release(packet.file_path)
+
+    def _get_table_limit(self, table):
+        """ Retrieves the semaphore limiting the loads of a table, or None if they are unlimited """
+        if self.table_concurrency is None:
+            return None
+
+        if table not in self.table_limits:
+            self.table_limits[table] = asyncio.Semaphore(self.table_concurrency, loop=self.loop)
+
+        return self.table_limits[table]
+
+    async def _load_limited(self, destination, packet, table, fmt):
+        """ Loads a chunk once both the table and the global limits, if any, allow it """
+        limits = [self._get_table_limit(table), self.limit]
+        acquired = []
+
+        try:
+            for limit in filter(None, limits):
+                await limit.acquire()
+                acquired.append(limit)
+
+            await self._load_chunk(destination, packet, table, fmt)
+        finally:
+            for limit in acquired:
+                limit.release()
+
+    async def _load_serial(self, destination, file_pkts, table, sequence, fmt):
+        """ Loads chunks one at a time, waiting for earlier chunks of the stream if ordered """
+        # pragma pylint: disable=too-many-arguments
+        failures = []
+
+        for file_pkt in sorted(file_pkts, key=_chunk_order):
+            ordered = sequence is not None and file_pkt.index is not None
+            if ordered:
+                await sequence.wait(file_pkt.index)
+
+            try:
+                await self._load_limited(destination, file_pkt, table, fmt)
+            except Exception as ex:  # pylint: disable=broad-except
+                if self.errors == "raise":
+                    raise
+
+                failures.append((file_pkt.file_path, ex))
+            finally:
+                # Later chunks still continue after a failure, rather than waiting forever
+                if ordered:
+                    sequence.advance(file_pkt.index)
+
+        return failures
+
+    async def _load_concurrent(self, destination, file_pkts, table, fmt):
+        """ Loads chunks concurrently, stopping at the first failure unless collecting errors """
+        file_pkts = sorted(file_pkts, key=_chunk_order)
+        tasks = [
+            asyncio.ensure_future(
+                self._load_limited(destination, file_pkt, table, fmt), loop=self.loop)
+            for file_pkt in file_pkts]
+
+        return_when = asyncio.ALL_COMPLETED
+        if self.errors == "raise":
+            return_when = asyncio.FIRST_EXCEPTION
+
+        try:
+            done, pending = await asyncio.wait(tasks, loop=self.loop, return_when=return_when)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if pending:
+            await asyncio.wait(pending, loop=self.loop)
+
+        failures = [
+            (file_pkt.file_path, task.exception())
+            for file_pkt, task in zip(file_pkts, tasks)
+            if task in done and task.exception() is not None]
+
+        if failures and self.errors == "raise":
+            raise failures[0][1]
+
+        return failures
+
+    def _end_sequence(self, message):
+        """ Drops the chunk sequence of a stream once its DataCompletePacket arrives """
+        complete_pkt = message.get_packet(packets.DataCompletePacket, default=None)
+        sequence = self.sequences.get(message.initial_id)
+
+        if complete_pkt is not None and sequence is not None and not sequence.waiters:
+            del self.sequences[message.initial_id]
+
     async def process(self, message):
+        file_pkts = message.get_packets(packets.DataFilePacket)
+
+        if not file_pkts:
+            self._end_sequence(message)
+
+            await message.forward()
+            return
+
         import_pkt = message.get_packet(packets.ImportTablePacket)
         format_pkt = message.get_packet(packets.DataFormatPacket)
         dest_pkt = message.get_packet(packets.DestinationPacket)
@@ -112,14 +295,37 @@ class FileImportStage(BaseImportStage):
         destination = dest_pkt.destination
         table = import_pkt.table
 
-        for file_pkt in message.get_packets(packets.DataFilePacket):
-            await self._load_chunk(destination, file_pkt, table, format_pkt)
+        if self.ordered and message.initial_id not in self.sequences:
+            self.sequences[message.initial_id] = ChunkSequence(loop=self.loop)
+
+        # Without any limits, the chunks of each message are loaded one at a time
+        serial = self.ordered or (self.concurrency is None and self.table_concurrency is None)
+
+        try:
+            if serial:
+                failures = await self._load_serial(destination, file_pkts, table,
+                    self.sequences.get(message.initial_id), format_pkt)
+            else:
+                failures = await self._load_concurrent(destination, file_pkts, table, format_pkt)
+        finally:
+            # Chunks which failed, or were never loaded, no longer count against the budget
+            if self.budget is not None:
+                for file_pkt in file_pkts:
+                    self.budget.release(file_pkt.file_path, loaded=False)
+
+            self._end_sequence(message)
+
+        if failures:
+            for file_path, ex in failures:
+                self.logger.error("Failed to load chunk %s of table %s: %r", file_path, table, ex)
+
+            raise exceptions.ChunkLoadException(table, failures)
 
         await message.forward()
 
 
-class FileOutputStage(base.BaseStage):
-    """ Writes a chunk out to a given file """
+class ChunkFileStage(base.BaseStage):
+    """ Base class for stages writing chunks of data into files in the upload folder """
 
     DEFAULT_FILE_ENCODING = "utf-8"
     DEFAULT_FILE_EXTENSION = "dat"
@@ -129,16 +335,10 @@ class FileOutputStage(base.BaseStage):
     DEFAULT_LINE_TERMINATOR = "\n"
     DEFAULT_FIELD_WRAPPER = "\""
 
-    EXECUTOR_WORKER_COUNT = os.cpu_count() // 2
-
-    def __init__(self, upload_folder, user, loop=None, **kwargs):
-        super(FileOutputStage, self).__init__(packets.DataFramePacket)
-        self.logger = logging.getLogger(__name__)
+    def __init__(self, upload_folder, user, *packet_types, loop=None, **kwargs):
+        super(ChunkFileStage, self).__init__(*packet_types)
         self.loop = loop
 
-        self.executor = process.ProcessPoolExecutor(
-            process.quiet_sigint, max_workers=self.EXECUTOR_WORKER_COUNT)
-
         self.encoding = kwargs.get("encoding", self.DEFAULT_FILE_ENCODING)
         self.file_extension = kwargs.get("file_extension", self.DEFAULT_FILE_EXTENSION)
 
@@ -150,6 +350,8 @@ class FileOutputStage(base.BaseStage):
             line_terminator=kwargs.get("line_terminator", self.DEFAULT_LINE_TERMINATOR),
             field_wrapper=kwargs.get("field_wrapper", self.DEFAULT_FIELD_WRAPPER))
 
+        self.budget = kwargs.get("budget", None)
+
     def _get_filename(self, table, chunk):
         """ Generates a filename for the given chunk of a table """
         filename = "{0}_{1}".format(table, chunk)
@@ -166,21 +368,161 @@ class FileOutputStage(base.BaseStage):
 
         return os.path.join(self.upload_folder, file_path)
 
-    async def _write_frame(self, frame, file_path, format_pkt):
+    async def _acquire_budget(self):
+        """ Waits until the disk budget, if any, allows more chunk files to be written """
+        if self.budget is not None:
+            await self.budget.acquire()
+
+    def _register_file(self, file_pkt):
+        """ Counts a chunk file against the disk budget, if any, until it is loaded """
+        if self.budget is not None:
+            self.budget.register(file_pkt.file_path, file_pkt.size)
+
+    @abc.abstractmethod
+    async def process(self, message):
+        pass
+
+
+class RotatingChunk(object):
+    """ Tracks the chunk file frames of a table are appended to, until it is rotated """
+
+    # pragma pylint: disable=too-few-public-methods
+
+    def __init__(self, loop=None):
+        self.lock = asyncio.Lock(loop=loop)
+
+        self.index = 0
+        self.file_path = None
+        self.metadata = None
+
+    def rotate(self):
+        """ Closes the current chunk file, returning a DataFilePacket describing it """
+        file_pkt = build_file_packet(self.file_path, self.index, self.metadata)
+
+        self.index += 1
+        self.file_path = None
+        self.metadata = None
+
+        return file_pkt
+
+
+class FileOutputStage(ChunkFileStage):
+    """ Writes a chunk out to a given file """
+
+    DEFAULT_SHARED_MEMORY = False
+    EXECUTOR_WORKER_COUNT = os.cpu_count() // 2
+
+    DEFAULT_FILE_SIZE = None
+    DEFAULT_FILE_ROWS = None
+
+    def __init__(self, upload_folder, user, loop=None, **kwargs):
+        super(FileOutputStage, self).__init__(upload_folder, user,
+            packets.DataFramePacket, packets.DataCompletePacket, loop=loop, **kwargs)
+
+        self.logger = logging.getLogger(__name__)
+        self.shared_memory = kwargs.get("shared_memory", self.DEFAULT_SHARED_MEMORY)
+
+        self.file_size = kwargs.get("file_size", self.DEFAULT_FILE_SIZE)
+        self.file_rows = kwargs.get("file_rows", self.DEFAULT_FILE_ROWS)
+
+        self.chunks = dict()
+
+        self.executor = process.ProcessPoolExecutor(
+            process.quiet_sigint, max_workers=self.EXECUTOR_WORKER_COUNT)
+
+    def _is_rotating(self):
+        return self.file_size is not None or self.file_rows is not None
+
+    def _is_full(self, chunk):
+        if self.file_size is not None and chunk.metadata.size >= self.file_size:
+            return True
+
+        return self.file_rows is not None and chunk.metadata.rows >= self.file_rows
+
+    async def _write_frame(self, frame, file_path, format_pkt, append=False, metadata=None):
+        # pragma pylint: disable=too-many-arguments
         relative_path = os.path.relpath(file_path, self.upload_folder)
-        self.logger.info("Writing frame file: %s", relative_path)
+        self.logger.info("%s frame file: %s",
+            "Appending to" if append else "Writing", relative_path)
+
+        if not self.shared_memory:
+            return await self.loop.run_in_executor(self.executor, write_frame,
+                frame, file_path, format_pkt, append, metadata)
+
+        with SharedFrame.create(frame) as handle:
+            return await self.loop.run_in_executor(self.executor, write_shared_frame,
+                handle, file_path, format_pkt, append, metadata)
+
+    async def _append_frames(self, chunk, table, frame_pkts, format_pkt):
+        """ Appends frames to the current chunk file, rotating it once it is full """
+        file_pkts = []
+
+        for frame_pkt in sorted(frame_pkts, key=lambda frame_pkt: frame_pkt.index):
+            if frame_pkt.frame.empty:
+                continue
+
+            append = chunk.file_path is not None
+            if not append:
+                chunk.file_path = self._get_file_path(table, chunk.index)
+
+            chunk.metadata = await self._write_frame(frame_pkt.frame, chunk.file_path,
+                format_pkt, append, chunk.metadata)
+
+            if self._is_full(chunk):
+                file_pkts.append(chunk.rotate())
 
-        await self.loop.run_in_executor(self.executor, write_frame,
-            frame, file_path, format_pkt)
+        return file_pkts
+
+    async def _process_rotating(self, message, table, format_pkt):
+        """ Streams frames into chunk files, only forwarding them on rotation or completion """
+        if message.initial_id not in self.chunks:
+            self.chunks[message.initial_id] = RotatingChunk(loop=self.loop)
+
+        chunk = self.chunks[message.initial_id]
+        frame_pkts = message.pop_packets(packets.DataFramePacket)
+
+        if frame_pkts:
+            await self._acquire_budget()
+
+        complete_pkt = message.get_packet(packets.DataCompletePacket, default=None)
+
+        # Messages of the same table may be processed concurrently, so append to the file in turn
+        async with chunk.lock:
+            file_pkts = await self._append_frames(chunk, table, frame_pkts, format_pkt)
+
+            if complete_pkt is not None:
+                if chunk.file_path is not None:
+                    file_pkts.append(chunk.rotate())
+
+                del self.chunks[message.initial_id]
+
+        for file_pkt in file_pkts:
+            self._register_file(file_pkt)
+
+        if file_pkts or complete_pkt is not None:
+            await message.forward(*file_pkts)
 
     async def process(self, message):
         import_pkt = message.get_packet(packets.ImportTablePacket)
         format_pkt = message.get_packet(packets.DataFormatPacket,
             default=self.format_pkt, add_if_missing=True)
 
-        for frame_pkt in message.pop_packets(packets.DataFramePacket):
+        if self._is_rotating():
+            await self._process_rotating(message, import_pkt.table, format_pkt)
+            return
+
+        frame_pkts = message.pop_packets(packets.DataFramePacket)
+        if not frame_pkts:
+            await message.forward()
+            return
+
+        await self._acquire_budget()
+
+        for frame_pkt in frame_pkts:
             chunk_filename = self._get_file_path(import_pkt.table, frame_pkt.index)
-            await self._write_frame(frame_pkt.frame, chunk_filename, format_pkt)
+            metadata = await self._write_frame(frame_pkt.frame, chunk_filename, format_pkt)
+
+            file_pkt = build_file_packet(chunk_filename, frame_pkt.index, metadata)
+            self._register_file(file_pkt)
 
-            file_pkt = packets.DataFilePacket(chunk_filename)
             await message.forward(file_pkt)
@@ -1,6 +1,7 @@
 """
 Defines a series of miscellaneous pipeline stages, including:
  - DelayStage
+ - FilterColumnsStage
  - PrefixTableStage
  - PromptInputStage
 """
@@ -8,8 +9,11 @@ Defines a series of miscellaneous pipeline stages, including:
 import asyncio
 import fnmatch
 
+from blazingdb import exceptions
+
 from . import base, custom
 from .. import packets
+from ..util import get_columns
 
 
 class DelayStage(custom.CustomActionStage):
@@ -24,6 +28,58 @@ class DelayStage(custom.CustomActionStage):
         await asyncio.sleep(self.delay)
 
 
+class FilterColumnsStage(base.BaseStage):
+    """ Pushes a set of columns and row filters down to the queries performed on the source """
+
+    def __init__(self, included=None, excluded=None, filters=None):
+        super(FilterColumnsStage, self).__init__(packets.ImportTablePacket)
+
+        self.included = included
+        self.excluded = excluded
+        self.filters = filters if filters is not None else dict()
+
+    def _filter_column(self, table, column):
+        name = "{0}.{1}".format(table, column.name)
+
+        def _matches(pattern):
+            return fnmatch.fnmatch(column.name, pattern) or fnmatch.fnmatch(name, pattern)
+
+        if self.excluded is not None and any(map(_matches, self.excluded)):
+            return True
+
+        return self.included is not None and not any(map(_matches, self.included))
+
+    def _get_filter(self, table):
+        for pattern, predicate in self.filters.items():
+            if fnmatch.fnmatch(table, pattern):
+                return predicate
+
+        return None
+
+    async def process(self, message):
+        import_pkt = message.get_packet(packets.ImportTablePacket)
+        table = import_pkt.table
+
+        columns = await get_columns(message)
+        filtered = [column for column in columns if not self._filter_column(table, column)]
+
+        if not filtered:
+            raise exceptions.PipelineException(
+                "All columns of table {0} were filtered".format(table))
+
+        columns_pkt = message.get_packet(packets.DataColumnsPacket, default=None)
+        if columns_pkt is not None:
+            message.remove_packet(columns_pkt)
+
+        message.add_packet(packets.DataColumnsPacket(filtered))
+
+        predicate = self._get_filter(table)
+        if predicate is not None:
+            message.add_packet(packets.DataFilterPacket(predicate))
+
+        await message.forward()
+
+
 class InjectPacketStage(custom.CustomActionStage):
     """ Injects a series of packets into messages passing through """
 
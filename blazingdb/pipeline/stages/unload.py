@@ -14,10 +14,11 @@ import botocore.session
 import pandas
 
 from blazingdb.util import process, s3
+from blazingdb.util.shared import SharedFrame
 
-from . import base
+from . import base, load
 from .. import packets
-from ..util import get_columns
+from ..util import get_columns, get_predicate
 
 
 # pragma pylint: disable=too-few-public-methods
@@ -58,6 +59,27 @@ def retrieve_unloaded_file(bucket, key, access_key, secret_key, columns, chunk_s
             infer_datetime_format=True, keep_default_na=False,
             engine="c", low_memory=False)
 
+def retrieve_shared_file(bucket, key, access_key, secret_key, columns, chunk_size):
+    """ Retrieves an unloaded file from S3 into shared memory, returning a SharedFrame """
+    frame = retrieve_unloaded_file(bucket, key, access_key, secret_key, columns, chunk_size)
+    return SharedFrame.create(frame)
+
+def write_unloaded_file(bucket, key, access_key, secret_key, columns, chunk_size, file_path,
+                        format_pkt):
+    """ Retrieves an unloaded file from S3 and writes it straight into a chunk file """
+    # pragma pylint: disable=too-many-arguments
+    frame = retrieve_unloaded_file(bucket, key, access_key, secret_key, columns, chunk_size)
+    return load.write_frame(frame, file_path, format_pkt)
+
+def read_manifest(client, bucket, key):
+    """ Reads the urls of the files unloaded from an unload manifest """
+    stream, _ = s3.open_file(client, bucket, key)
+
+    with contextlib.closing(stream):
+        manifest_json = json.loads(stream.read())
+
+    return [entry["url"] for entry in manifest_json["entries"]]
+
 def _attach_iter_method(stream, chunk_size):
     def _iter(target):
         while True:
@@ -109,15 +131,10 @@ class UnloadGenerationStage(base.BaseStage):
             key = self.path_prefix + "/" + key
 
         columns = await get_columns(message, add_if_missing=True)
-        query_columns = ",".join(column.name for column in columns)
+        query = source.build_query(table, columns, get_predicate(message))
 
         message.add_packet(packets.DataUnloadPacket(self.bucket, key))
 
-        query = " ".join([
-            "SELECT {0}".format(query_columns),
-            "FROM {0}".format(source.get_identifier(table))
-        ])
-
         self.logger.debug("Unloading data from Redshift with query, %s", query)
 
         await source.execute(" ".join([
@@ -136,6 +153,7 @@ class UnloadRetrievalStage(base.BaseStage):
 
     DEFAULT_CHUNK_SIZE = 65536
     DEFAULT_PENDING_HANDLES = os.cpu_count() / 2
+    DEFAULT_SHARED_MEMORY = False
 
     EXECUTOR_WORKER_COUNT = os.cpu_count() // 2
 
@@ -155,14 +173,7 @@ class UnloadRetrievalStage(base.BaseStage):
 
         self.chunk_size = kwargs.get("chunk_size", self.DEFAULT_CHUNK_SIZE)
         self.pending_handles = kwargs.get("pending_handles", self.DEFAULT_PENDING_HANDLES)
-
-    def _read_manifest(self, bucket, key):
-        stream, _ = s3.open_file(self.client, bucket, key)
-
-        with contextlib.closing(stream):
-            manifest_json = json.loads(stream.read())
-
-        return [entry["url"] for entry in manifest_json["entries"]]
+        self.shared_memory = kwargs.get("shared_memory", self.DEFAULT_SHARED_MEMORY)
 
     async def _limit_pending(self, pending):
         while len(pending) > self.pending_handles:
@@ -177,14 +188,21 @@ class UnloadRetrievalStage(base.BaseStage):
         bucket, key = s3.parse_url(url)
         self.logger.info("Retrieving unloaded file: %s", key)
 
-        return await self.loop.run_in_executor(self.executor, retrieve_unloaded_file,
+        if not self.shared_memory:
+            return await self.loop.run_in_executor(self.executor, retrieve_unloaded_file,
+                bucket, key, self.access_key, self.secret_key, columns, self.chunk_size)
+
+        handle = await self.loop.run_in_executor(self.executor, retrieve_shared_file,
             bucket, key, self.access_key, self.secret_key, columns, self.chunk_size)
 
+        with handle:
+            return handle.read()
+
     async def process(self, message):
         unload_pkt = message.pop_packet(packets.DataUnloadPacket)
         manifest = unload_pkt.key + "manifest"
 
-        urls = self._read_manifest(unload_pkt.bucket, manifest)
+        urls = read_manifest(self.client, unload_pkt.bucket, manifest)
         columns = await get_columns(message)
 
         pending = []
@@ -201,3 +219,81 @@ class UnloadRetrievalStage(base.BaseStage):
             await asyncio.wait(pending, loop=self.loop)
 
         await message.forward(packets.DataCompletePacket())
+
+
+class UnloadOutputStage(load.ChunkFileStage):
+    """ Retrieves unloaded files and writes them as chunk files, in a single worker call each """
+
+    DEFAULT_CHUNK_SIZE = 65536
+    EXECUTOR_WORKER_COUNT = os.cpu_count() // 2
+
+    def __init__(self, upload_folder, user, access_key, secret_key, loop=None, **kwargs):
+        # pragma pylint: disable=too-many-arguments
+        super(UnloadOutputStage, self).__init__(
+            upload_folder, user, packets.DataUnloadPacket, loop=loop, **kwargs)
+
+        self.logger = logging.getLogger(__name__)
+
+        self.access_key = access_key
+        self.secret_key = secret_key
+
+        self.client = botocore.session.get_session().create_client("s3",
+            aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+
+        self.executor = process.ProcessPoolExecutor(
+            process.quiet_sigint, max_workers=self.EXECUTOR_WORKER_COUNT)
+
+        self.chunk_size = kwargs.get("chunk_size", self.DEFAULT_CHUNK_SIZE)
+        self.workers = asyncio.Semaphore(self.EXECUTOR_WORKER_COUNT, loop=self.loop)
+
+    async def _write_file(self, url, columns, index, file_path, format_pkt):
+        # pragma pylint: disable=too-many-arguments
+        bucket, key = s3.parse_url(url)
+
+        # Only wait on the disk budget once a worker is free, so files are counted as written
+        async with self.workers:
+            await self._acquire_budget()
+            self.logger.info("Retrieving unloaded file into chunk: %s", key)
+
+            metadata = await self.loop.run_in_executor(self.executor, write_unloaded_file,
+                bucket, key, self.access_key, self.secret_key, columns, self.chunk_size,
+                file_path, format_pkt)
+
+            self.logger.debug("Wrote %s row(s), %s byte(s) to %s",
+                metadata.rows, metadata.size, file_path)
+
+            file_pkt = load.build_file_packet(file_path, index, metadata)
+            self._register_file(file_pkt)
+
+        return file_pkt
+
+    async def process(self, message):
+        import_pkt = message.get_packet(packets.ImportTablePacket)
+        format_pkt = message.get_packet(packets.DataFormatPacket,
+            default=self.format_pkt, add_if_missing=True)
+
+        unload_pkt = message.pop_packet(packets.DataUnloadPacket)
+        manifest = unload_pkt.key + "manifest"
+
+        urls = read_manifest(self.client, unload_pkt.bucket, manifest)
+        columns = await get_columns(message)
+
+        # The workers limit how many files are retrieved at once, so queue them all
+        tasks = [
+            asyncio.ensure_future(self._write_file(url, columns, i,
+                self._get_file_path(import_pkt.table, i), format_pkt), loop=self.loop)
+            for i, url in enumerate(urls)]
+
+        pending = []
+        try:
+            for task in asyncio.as_completed(tasks, loop=self.loop):
+                file_pkt = await task
+                pending.append(await message.forward(file_pkt, track_children=True))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if pending:
+            await asyncio.wait(pending, loop=self.loop)
+
+        await message.forward(packets.DataCompletePacket())
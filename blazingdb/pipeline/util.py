@@ -2,6 +2,8 @@
 Defines several helper methods for messages
 """
 
+import datetime
+
 from . import packets
 
 
@@ -22,3 +24,33 @@ async def get_columns(message, add_if_missing=False):
         message.add_packet(packets.DataColumnsPacket(columns))
 
     return columns
+
+def format_literal(value):
+    """ Formats a value as a SQL literal """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat(" ") if isinstance(value, datetime.datetime) else value.isoformat()
+
+    if isinstance(value, str):
+        return "'{0}'".format(value.replace("'", "''"))
+
+    return str(value)
+
+def get_predicate(message):
+    """ Builds a predicate restricting the rows to import for a message, if there is one """
+    predicates = sorted(
+        "({0})".format(filter_pkt.predicate)
+        for filter_pkt in message.get_packets(packets.DataFilterPacket))
+
+    watermark_pkt = message.get_packet(packets.WatermarkPacket, default=None)
+    if watermark_pkt is not None:
+        column = watermark_pkt.column
+        high = format_literal(watermark_pkt.high)
+
+        # The first import rebuilds the table, so it must include rows without a watermark
+        if watermark_pkt.low is None:
+            predicates.append("({0} <= {1} OR {0} IS NULL)".format(column, high))
+        else:
+            predicates.append("{0} > {1}".format(column, format_literal(watermark_pkt.low)))
+            predicates.append("{0} <= {1}".format(column, high))
+
+    return " AND ".join(predicates) if predicates else None
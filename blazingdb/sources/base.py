@@ -5,12 +5,20 @@ Defines the base class for data sources
 import abc
 from collections import namedtuple
 
+from .cache import MetadataCache
+
 
 Column = namedtuple("Column", ["name", "type", "size"])
 
 class BaseSource(object, metaclass=abc.ABCMeta):
     """ Handles retrieving data from a given source (eg. PostgreSQL) """
 
+    def __init__(self, loop=None, **kwargs):
+        self.loop = loop
+        self.cache = MetadataCache(loop=loop,
+            size=kwargs.get("cache_size", MetadataCache.DEFAULT_SIZE),
+            ttl=kwargs.get("cache_ttl", MetadataCache.DEFAULT_TTL))
+
     async def close(self):
         """ Closes the source, releasing any contained resources """
 
@@ -18,18 +26,84 @@ class BaseSource(object, metaclass=abc.ABCMeta):
     def get_identifier(self, table, schema=None):
         """ Creates an identifier for the given schema and table """
 
-    @abc.abstractmethod
+    def build_query(self, table, columns, predicate=None):
+        """ Builds a query selecting columns of a table, optionally filtered by a predicate """
+        query = "SELECT {0} FROM {1}".format(
+            ", ".join(column.name for column in columns), self.get_identifier(table))
+
+        if predicate is not None:
+            query = "{0} WHERE {1}".format(query, predicate)
+
+        return query
+
     async def get_columns(self, table):
+        """ Retrieves a list of columns for the given table, using cached results if possible """
+        return await self.cache.get(("columns", table), lambda: self._retrieve_columns(table))
+
+    async def get_tables(self):
+        """ Retrieves a list of the tables in this source, using cached results if possible """
+        return await self.cache.get(("tables",), self._retrieve_tables)
+
+    async def get_all_columns(self):
+        """ Retrieves the columns for every table in the source, caching them for get_columns """
+        all_columns = await self._retrieve_all_columns()
+
+        for table, columns in all_columns.items():
+            self.cache.put(("columns", table), columns)
+
+        return all_columns
+
+    def invalidate_metadata(self, table=None):
+        """ Removes cached metadata for the given table, or all metadata if no table is given """
+        if table is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(("columns", table), ("tables",))
+
+    @abc.abstractmethod
+    async def _retrieve_columns(self, table):
         """ Retrieves a list of columns for the given table from the source """
 
     @abc.abstractmethod
-    async def get_tables(self):
+    async def _retrieve_tables(self):
         """ Retrieves a list of the tables in this source """
 
+    async def _retrieve_all_columns(self):
+        """ Retrieves a dictionary of the columns for every table in the source """
+        return {table: await self.get_columns(table) for table in await self.get_tables()}
+
     @abc.abstractmethod
     async def execute(self, query, *args):
         """ Executes a custom query against the source, ignoring the results """
 
+    async def execute_many(self, queries):
+        """ Executes a batch of queries against the source, returning the error for each query """
+        errors = []
+
+        for query in queries:
+            try:
+                await self.execute(query)
+            except Exception as ex:  # pylint: disable=broad-except
+                errors.append(ex)
+            else:
+                errors.append(None)
+
+        return errors
+
     @abc.abstractmethod
     async def query(self, query, *args):
         """ Performs a custom query against the source """
+
+    async def query_value(self, query, *args):
+        """ Performs a custom query against the source, returning the first value or None """
+        async for frame in self.query(query, *args):
+            if not frame.empty:
+                return frame.iloc[0, 0]
+
+        return None
+
+    async def query_partitions(self, table, columns, partitions, key=None, predicate=None):
+        """ Reads a table in partitions where supported, yielding (partition, frame) pairs """
+        # pragma pylint: disable=unused-argument,too-many-arguments
+        async for frame in self.query(self.build_query(table, columns, predicate)):
+            yield 0, frame
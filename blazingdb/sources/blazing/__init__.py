@@ -3,6 +3,7 @@ Package containing all the different sources of data which can be migrated into
 """
 
 from .connector import BlazingConnector
+from .pool import BlazingConnectorPool
 from .source import BlazingSource
 
-__all__ = ["connector", "source"]
+__all__ = ["connector", "pool", "source"]
@@ -3,17 +3,29 @@ Defines the Postgres migrator for moving data into BlazingDB from Postgres
 """
 
 import asyncio
+import collections
 import logging
+import time
 
 import aiohttp
 
 from blazingdb import exceptions
+from blazingdb.util.limiter import AdaptiveLimiter
+
+from .decoder import ResultsDecoder
 
 
 class BlazingConnector(object):
     """ Handles connecting and querying BlazingDB instances """
 
+    DEFAULT_FETCH_COUNT = 20000
+    DEFAULT_READ_SIZE = 65536
     DEFAULT_REQUEST_LIMIT = 5
+    DEFAULT_TOKEN_TTL = 600
+
+    LOAD_PREFIXES = ("load data",)
+    METADATA_PREFIXES = ("describe", "list", "show", "use")
+    REQUEST_CLASSES = ["load", "metadata", "query"]
 
     SERVER_RESTART_ERROR = "The BlazingDB server is restarting please try again in a moment."
     SERVER_IMPORT_WARNING = " ".join([
@@ -22,6 +34,7 @@ class BlazingConnector(object):
 
     def __init__(self, host, user, password, loop=None, **kwargs):
         self.logger = logging.getLogger(__name__)
+        self.loop = loop
 
         conn = aiohttp.TCPConnector(loop=loop, verify_ssl=False)
         self.session = aiohttp.ClientSession(connector=conn, loop=loop)
@@ -33,51 +46,110 @@ class BlazingConnector(object):
         protocol = "https" if (kwargs.get("https", True)) else "http"
         port = kwargs.get("port", 8080 if protocol == "http" else 8443)
         request_limit = kwargs.get("request_limit", self.DEFAULT_REQUEST_LIMIT)
+        max_request_limit = kwargs.get("max_request_limit", request_limit)
 
         self.baseurl = "{0}://{1}:{2}".format(protocol, host, port)
+
+        # The request limit caps requests across all classes, which each back off within it
         self.semaphore = asyncio.BoundedSemaphore(request_limit, loop=loop)
+        self.limiters = {
+            request_class: AdaptiveLimiter(request_limit, loop=loop,
+                min_limit=kwargs.get("min_request_limit", 1), max_limit=max_request_limit)
+            for request_class in self.REQUEST_CLASSES}
+
+        self.fetch_count = kwargs.get("fetch_count", self.DEFAULT_FETCH_COUNT)
+        self.read_size = kwargs.get("read_size", self.DEFAULT_READ_SIZE)
+
+        self.token_ttl = kwargs.get("token_ttl", self.DEFAULT_TOKEN_TTL)
+        self.token_locks = collections.defaultdict(lambda: asyncio.Lock(loop=loop))
+        self.tokens = dict()
 
     def close(self):
         """ Closes the given connector and cleans up the session """
         self.password = None
+        self.tokens.clear()
         self.session.close()
 
+    def get_stats(self):
+        """ Retrieves the state of the request limiters for each class of request """
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
+
     def _build_url(self, path):
         """ Builds a url to access the given path in Blazing """
         return "{0}/blazing-jdbc/{1}".format(self.baseurl, path)
 
-    async def _perform_request(self, path, data, callback):
+    def classify_query(self, query):
+        """ Determines the class of request the given query should be limited under """
+        statement = query.lstrip().lower()
+
+        if statement.startswith(self.LOAD_PREFIXES):
+            return "load"
+        if statement.startswith(self.METADATA_PREFIXES):
+            return "metadata"
+
+        return "query"
+
+    async def _perform_request(self, path, data, callback, request_class="metadata"):
         """ Performs a request against the given path in Blazing """
         url = self._build_url(path)
+        limiter = self.limiters[request_class]
 
         self.logger.debug("Performing request to BlazingDB (%s): %s", url, data)
 
-        async with self.semaphore:
-            async with self.session.post(url, data=data, timeout=None) as response:
-                if response.status != 200:
-                    raise exceptions.RequestException(response.status, await response.text())
+        overloaded = True
+        started = await limiter.acquire()
+
+        try:
+            async with self.semaphore:
+                # Time from when the request is sent, so other classes don't skew the latency
+                started = time.monotonic()
+
+                async with self.session.post(url, data=data, timeout=None) as response:
+                    if response.status != 200:
+                        overloaded = response.status >= 500
+                        raise exceptions.RequestException(
+                            response.status, await response.text())
+
+                    result = await callback(response)
+                    overloaded = False
+
+                    response.close()
+                    return result
+        finally:
+            limiter.release(started, overloaded=overloaded)
+
+    async def _decode_results(self, response):
+        """ Decodes the results of a get-results request as they are read from the response """
+        decoder = ResultsDecoder(self.fetch_count)
 
-                result = await callback(response)
+        while True:
+            data = await response.content.read(self.read_size)
 
-                response.close()
-                return result
+            if not data:
+                break
 
-    async def _perform_get_results(self, login_token, result_token):
+            decoder.feed(data)
+
+        return decoder.close()
+
+    async def _perform_get_results(self, login_token, result_token, request_class="metadata"):
         """ Performs a request to retrieves the results for the given request token """
         data = {"resultSetToken": result_token, "token": login_token}
-        return await self._perform_request("get-results", data, lambda r: r.json())
+        return await self._perform_request("get-results", data,
+            self._decode_results, request_class=request_class)
 
-    async def _perform_query(self, query, login_token):
+    async def _perform_query(self, query, login_token, request_class="metadata"):
         """ Performs a query against Blazing """
         data = {"username": self.user, "query": query.lower(), "token": login_token}
-        return await self._perform_request("query", data, lambda r: r.text())
+        return await self._perform_request("query", data,
+            lambda r: r.text(), request_class=request_class)
 
     async def _perform_register(self):
         """ Performs a register request against Blazing, logging the user in """
         data = {"username": self.user, "password": self.password}
         return await self._perform_request("register", data, lambda r: r.text())
 
-    async def _connect(self):
+    async def _connect(self, database):
         """ Initialises the connection to Blazing """
         token = await self._perform_register()
         if token == "fail":
@@ -85,26 +157,60 @@ class BlazingConnector(object):
 
         self.logger.debug("Retrieved login token %s", token)
 
-        if self.database is not None:
-            await self._perform_query("USE DATABASE {0}".format(self.database), token)
+        if database is not None:
+            await self._perform_query("USE DATABASE {0}".format(database), token)
 
         return token
 
+    def _is_token_valid(self, entry, rejected):
+        """ Checks whether a cached token entry can still be used """
+        if entry is None:
+            return False
+
+        token, expiry = entry
+        if token == rejected:
+            return False
+
+        return expiry is None or expiry > time.monotonic()
+
+    async def _get_token(self, database, rejected=None):
+        """ Retrieves a login token for the given database, registering if it isn't cached """
+        async with self.token_locks[database]:
+            entry = self.tokens.get(database)
+            if self._is_token_valid(entry, rejected):
+                return entry[0]
+
+            token = await self._connect(database)
+            expiry = time.monotonic() + self.token_ttl if self.token_ttl is not None else None
+
+            self.tokens[database] = (token, expiry)
+            return token
+
     async def _query(self, query):
-        login_token = await self._connect()
-        result_token = await self._perform_query(query, login_token)
+        request_class = self.classify_query(query)
+        started = time.monotonic()
+
+        login_token = await self._get_token(self.database)
+        result_token = await self._perform_query(query, login_token, request_class)
+
+        if result_token == "fail":
+            self.logger.debug("Login token %s was rejected, registering again", login_token)
+
+            login_token = await self._get_token(self.database, rejected=login_token)
+            result_token = await self._perform_query(query, login_token, request_class)
 
         if result_token == "fail":
             raise exceptions.QueryException(query, None)
 
-        results = await self._perform_get_results(login_token, result_token)
+        results = await self._perform_get_results(login_token, result_token, request_class)
         if results["status"] == "fail":
-            rows = results["rows"]
+            chunks = results["chunks"]
 
-            if len(rows) == 1 and len(rows[0]) == 1:
-                error = rows[0][0]
+            if len(chunks) == 1 and len(chunks[0]) == 1 and len(chunks[0][0]) == 1:
+                error = chunks[0][0][0]
 
                 if error == self.SERVER_RESTART_ERROR:
+                    self.limiters[request_class].backoff(started)
                     raise exceptions.ServerRestartException(query, results)
                 elif error == self.SERVER_IMPORT_WARNING:
                     raise exceptions.ServerImportWarning(query, results)
@@ -119,3 +225,11 @@ class BlazingConnector(object):
             return await self._query(query)
         except aiohttp.ClientError as ex:
             raise exceptions.QueryException(query, None) from ex
+
+    async def query_many(self, queries):
+        """ Performs a batch of queries against Blazing, returning the results or error of each """
+        # Register up front so every query in the batch shares a single login token
+        await self._get_token(self.database)
+
+        return await asyncio.gather(*[self.query(query) for query in queries],
+            loop=self.loop, return_exceptions=True)
@@ -0,0 +1,227 @@
+"""
+Defines the ResultsDecoder class for incrementally decoding get-results responses from BlazingDB
+"""
+
+import codecs
+import json
+import re
+
+import numpy
+
+from blazingdb import exceptions
+
+
+NUMPY_TYPES = {
+    "bool": "bool", "date": "datetime64[ms]",
+
+    "float": "float64", "double": "float64",
+
+    "char": "int64", "short": "int64",
+    "int": "int64", "long": "int64",
+
+    "string": "object"
+}
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def build_column(values, column_type):
+    """ Converts a list of values into a NumPy array for the given BlazingDB data type """
+    dtype = NUMPY_TYPES.get(column_type, "object")
+
+    # NumPy silently converts nulls to False in boolean arrays
+    if dtype == "bool" and None in values:
+        dtype = "object"
+
+    try:
+        return numpy.array(values, dtype=dtype)
+    except (TypeError, ValueError):
+        # Integer columns containing nulls can only be represented as floats
+        if dtype == "int64":
+            return numpy.array(values, dtype="float64")
+
+        return numpy.array(values, dtype="object")
+
+
+class ResultsDecoder(object):
+    """ Decodes a get-results response as it is read, into chunks of typed columns """
+
+    # pragma pylint: disable=too-many-instance-attributes
+
+    ENCODING = "utf-8"
+
+    def __init__(self, fetch_count):
+        self.fetch_count = fetch_count
+
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder(self.ENCODING)()
+
+        self.buffer = ""
+        self.position = 0
+        self.state = self._parse_start
+        self.finished = False
+
+        self.key = None
+        self.values = dict()
+
+        self.columns = None
+        self.row_count = 0
+        self.chunks = []
+
+    def _skip_whitespace(self):
+        self.position = WHITESPACE.match(self.buffer, self.position).end()
+        return self.position < len(self.buffer)
+
+    def _peek(self):
+        return self.buffer[self.position]
+
+    def _decode_value(self):
+        """ Decodes the next value in the buffer, returning False if more data is required """
+        try:
+            value, end = self.decoder.raw_decode(self.buffer, self.position)
+        except json.JSONDecodeError:
+            return False
+
+        # Values are always followed by a separator, so a value ending the buffer may be partial
+        if end >= len(self.buffer):
+            return False
+
+        self.position = end
+        return value
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise exceptions.ResultsDecodeException(self.position, self.buffer[self.position:])
+
+        self.position += 1
+
+    def _parse_start(self):
+        self._expect("{")
+        self.state = self._parse_key
+        return True
+
+    def _parse_key(self):
+        if self._peek() == ",":
+            self.position += 1
+            return True
+
+        if self._peek() == "}":
+            self.position += 1
+            self.state = self._parse_end
+            self.finished = True
+            return True
+
+        start = self.position
+        key = self._decode_value()
+
+        if key is False:
+            return False
+
+        if not self._skip_whitespace():
+            self.position = start
+            return False
+
+        self._expect(":")
+
+        self.key = key
+        self.state = self._parse_value
+        return True
+
+    def _parse_value(self):
+        if self.key == "rows" and self._peek() == "[":
+            self.position += 1
+            self.state = self._parse_row
+            return True
+
+        value = self._decode_value()
+
+        if value is False:
+            return False
+
+        self.values[self.key] = value
+        self.state = self._parse_key
+        return True
+
+    def _parse_row(self):
+        if self._peek() == ",":
+            self.position += 1
+            return True
+
+        if self._peek() == "]":
+            self.position += 1
+            self.state = self._parse_key
+            return True
+
+        row = self._decode_value()
+
+        if row is False:
+            return False
+
+        self._append_row(row)
+        return True
+
+    def _parse_end(self):
+        raise exceptions.ResultsDecodeException(self.position, self.buffer[self.position:])
+
+    def _append_row(self, row):
+        if self.columns is None:
+            self.columns = [[] for _ in row]
+
+        for column, value in zip(self.columns, row):
+            column.append(value)
+
+        self.row_count += 1
+        if self.row_count >= self.fetch_count:
+            self._flush()
+
+    def _flush(self):
+        """ Moves the pending rows into a new chunk, converting them if the types are known """
+        if self.columns is None or not self.row_count:
+            return
+
+        self.chunks.append(self.columns)
+
+        self.columns = [[] for _ in self.columns]
+        self.row_count = 0
+
+        self._convert_chunks()
+
+    def _convert_chunks(self):
+        """ Converts any chunks still containing lists into NumPy arrays """
+        if "columnTypes" not in self.values:
+            return
+
+        column_types = self.values["columnTypes"]
+
+        for i, chunk in enumerate(self.chunks):
+            if chunk and isinstance(chunk[0], numpy.ndarray):
+                continue
+
+            types = column_types if column_types is not None else [None] * len(chunk)
+            self.chunks[i] = [build_column(values, t) for values, t in zip(chunk, types)]
+
+    def feed(self, data):
+        """ Decodes the given bytes, converting any completed rows into columns """
+        self.buffer += self.text_decoder.decode(data)
+
+        while self._skip_whitespace() and self.state():
+            pass
+
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+
+    def close(self):
+        """ Finishes decoding, returning the decoded response """
+        self.buffer += self.text_decoder.decode(b"", final=True)
+
+        if not self.finished or self._skip_whitespace():
+            raise exceptions.ResultsDecodeException(self.position, self.buffer[self.position:])
+
+        self.values.setdefault("columnTypes", None)
+
+        self._flush()
+        self._convert_chunks()
+
+        results = dict(self.values)
+        results["chunks"] = self.chunks
+
+        return results
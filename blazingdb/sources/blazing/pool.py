@@ -0,0 +1,170 @@
+"""
+Defines the BlazingConnectorPool for spreading requests across multiple BlazingDB nodes
+"""
+
+import asyncio
+import logging
+
+import aiohttp
+
+from blazingdb import exceptions
+
+from .connector import BlazingConnector
+
+
+class BlazingNode(object):
+    """ Tracks the state of a single BlazingDB node within a pool """
+
+    def __init__(self, host, connector):
+        self.host = host
+        self.connector = connector
+
+        self.healthy = True
+        self.outstanding = 0
+        self.probe = None
+
+    def latency(self):
+        """ Retrieves the average latency of the node's query requests """
+        latency = self.connector.limiters["query"].latency
+        return latency if latency is not None else 0.0
+
+    def score(self, strategy):
+        """ Calculates the score used to select a node, lower scores being preferred """
+        if strategy == "latency":
+            return (self.outstanding + 1) * self.latency()
+
+        return self.outstanding
+
+
+class BlazingConnectorPool(object):
+    """ Handles spreading queries across a series of BlazingDB nodes """
+
+    DEFAULT_PROBE_INTERVAL = 10
+    DEFAULT_PROBE_QUERY = "LIST TABLES"
+    DEFAULT_STRATEGY = "least_outstanding"
+
+    def __init__(self, hosts, user, password, loop=None, **kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        if not hosts:
+            raise ValueError("BlazingConnectorPool requires at least one host")
+
+        self.nodes = [
+            BlazingNode(host, BlazingConnector(host, user, password, loop=loop, **kwargs))
+            for host in hosts]
+
+        self.probe_interval = kwargs.get("probe_interval", self.DEFAULT_PROBE_INTERVAL)
+        self.probe_query = kwargs.get("probe_query", self.DEFAULT_PROBE_QUERY)
+        self.strategy = kwargs.get("strategy", self.DEFAULT_STRATEGY)
+
+    def close(self):
+        """ Closes all connectors in the pool and stops any running health probes """
+        for node in self.nodes:
+            if node.probe is not None:
+                node.probe.cancel()
+
+            node.connector.close()
+
+    def get_stats(self):
+        """ Retrieves the state of each node in the pool """
+        return {
+            node.host: {
+                "healthy": node.healthy,
+                "outstanding": node.outstanding,
+                "limiters": node.connector.get_stats()
+            } for node in self.nodes}
+
+    def _select_node(self, excluded):
+        """ Selects the node to perform the next request against """
+        candidates = [node for node in self.nodes if node.healthy and node not in excluded]
+
+        if not candidates:
+            candidates = [node for node in self.nodes if node not in excluded]
+
+        if not candidates:
+            return None
+
+        return min(candidates, key=lambda node: node.score(self.strategy))
+
+    def _remove_node(self, node):
+        """ Takes a node out of rotation until a health probe succeeds """
+        if not node.healthy:
+            return
+
+        self.logger.warning("Removing BlazingDB node %s from rotation", node.host)
+
+        node.healthy = False
+        node.probe = asyncio.ensure_future(self._probe_node(node), loop=self.loop)
+
+    async def _probe_node(self, node):
+        """ Periodically queries an unhealthy node, returning it to rotation once it responds """
+        while not node.healthy:
+            await asyncio.sleep(self.probe_interval, loop=self.loop)
+
+            try:
+                await node.connector.query(self.probe_query)
+            except exceptions.BlazingException:
+                self.logger.debug("Health probe failed for BlazingDB node %s", node.host)
+                continue
+
+            self.logger.info("Returning BlazingDB node %s to rotation", node.host)
+
+            node.healthy = True
+            node.probe = None
+
+    @staticmethod
+    def _is_node_failure(ex):
+        """ Checks whether an exception means the node itself is unavailable """
+        if isinstance(ex, (exceptions.ServerRestartException,
+                           exceptions.ConnectionFailedException)):
+            return True
+
+        if isinstance(ex, exceptions.RequestException):
+            return ex.status >= 500
+
+        return isinstance(ex.__cause__, aiohttp.ClientError)
+
+    @staticmethod
+    def _can_retry(node, query, ex):
+        """ Checks whether a query can be retried on another node without running it twice """
+        if isinstance(ex, (exceptions.ServerRestartException,
+                           exceptions.ConnectionFailedException)):
+            return True
+
+        # The node may have applied a load before failing, so only retry other statements
+        return node.connector.classify_query(query) != "load"
+
+    async def _query_node(self, node, query):
+        node.outstanding += 1
+
+        try:
+            return await node.connector.query(query)
+        finally:
+            node.outstanding -= 1
+
+    async def query(self, query):
+        """ Performs a query against one of the nodes in the pool """
+        excluded = []
+
+        while True:
+            node = self._select_node(excluded)
+
+            try:
+                return await self._query_node(node, query)
+            except exceptions.BlazingException as ex:
+                if not self._is_node_failure(ex):
+                    raise
+
+                self._remove_node(node)
+                excluded.append(node)
+
+                if not self._can_retry(node, query, ex) or self._select_node(excluded) is None:
+                    raise
+
+                self.logger.debug("Retrying query on another node, %s", query)
+
+    async def query_many(self, queries):
+        """ Performs a batch of queries across the pool, returning the results or error of each """
+        return await asyncio.gather(*[self.query(query) for query in queries],
+            loop=self.loop, return_exceptions=True)
@@ -2,6 +2,7 @@
 Defines the Postgres migrator for moving data into BlazingDB from Postgres
 """
 
+import asyncio
 import math
 import logging
 
@@ -16,7 +17,7 @@ class BlazingSource(base.BaseSource):
     """ Handles connecting and retrieving data from Postgres, and loading it into BlazingDB """
 
     def __init__(self, connector, schema, **kwargs):
-        super(BlazingSource, self).__init__()
+        super(BlazingSource, self).__init__(**kwargs)
         self.logger = logging.getLogger(__name__)
 
         self.separator = kwargs.get("separator", "$")
@@ -31,7 +32,7 @@ class BlazingSource(base.BaseSource):
         schema = self.schema if schema is None else schema
         return self.separator.join([schema, table])
 
-    async def get_tables(self):
+    async def _retrieve_tables(self):
         """ Retrieves a list of the tables in this source """
         results = self.query("LIST TABLES")
         tables = [table async for frame in results for table in frame.iloc[:, 0]]
@@ -40,7 +41,7 @@ class BlazingSource(base.BaseSource):
 
         return tables
 
-    async def get_columns(self, table):
+    async def _retrieve_columns(self, table):
         """ Retrieves a list of columns for the given table from the source """
         identifier = self.get_identifier(table)
         results = self.query("DESCRIBE TABLE {0}".format(identifier))
@@ -60,6 +61,27 @@ class BlazingSource(base.BaseSource):
 
         return columns
 
+    async def _retrieve_all_columns(self):
+        """ Retrieves the columns for every table, describing each concurrently """
+        tables = await self.get_tables()
+        results = await asyncio.gather(*[self.get_columns(table) for table in tables],
+            loop=self.connector.loop, return_exceptions=True)
+
+        all_columns = dict()
+        for table, columns in zip(tables, results):
+            # Tables dropped since they were listed fail to describe, but anything else is raised
+            if isinstance(columns, exceptions.QueryException):
+                self.logger.warning("Skipping table %s as it couldn't be described, %r",
+                    table, columns)
+                continue
+
+            if isinstance(columns, BaseException):
+                raise columns
+
+            all_columns[table] = columns
+
+        return all_columns
+
     async def execute(self, query, *args):
         """ Executes a custom query against the source, ignoring the results """
         results = self.query(query, *args)
@@ -67,24 +89,26 @@ class BlazingSource(base.BaseSource):
         async for _ in results:
             return
 
+    async def execute_many(self, queries):
+        """ Executes a batch of queries against the source, returning the error for each query """
+        results = await self.connector.query_many(queries)
+
+        return [result if isinstance(result, Exception) else None for result in results]
+
     async def query(self, query, *args):
         """ Performs a custom query against the source """
         if args:
             raise NotImplementedError("Parameterized queries are unsupported by Blazing")
 
         results = await self.connector.query(query)
-        frame = pandas.DataFrame(results["rows"])
-
-        if results["columnTypes"] is not None:
-            types = [convert_datatype(t) for t in results["columnTypes"]]
-
-            for i, column_type in enumerate(types):
-                if column_type == "str":
-                    continue
+        chunks = results["chunks"]
 
-                frame[i] = frame[i].astype(column_type)
+        if not chunks:
+            yield pandas.DataFrame()
 
-        yield frame
+        while chunks:
+            columns = chunks.pop(0)
+            yield pandas.DataFrame(dict(enumerate(columns)), copy=False)
 
 
 DATATYPE_MAP = {
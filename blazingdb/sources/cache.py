@@ -0,0 +1,113 @@
+"""
+Defines the MetadataCache class for caching table metadata retrieved from sources
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+
+class MetadataCache(object):
+    """ A size-bounded LRU cache whose entries expire after a given time """
+
+    DEFAULT_SIZE = 1024
+    DEFAULT_TTL = 300
+
+    def __init__(self, loop=None, **kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop
+
+        self.size = kwargs.get("size", self.DEFAULT_SIZE)
+        self.ttl = kwargs.get("ttl", self.DEFAULT_TTL)
+
+        self.entries = collections.OrderedDict()
+        self.pending = dict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key):
+        """ Retrieves an entry from the cache, returning None if it is missing or expired """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+
+        _, expiry = entry
+        if expiry is not None and expiry <= time.monotonic():
+            del self.entries[key]
+            return None
+
+        self.entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+
+        self.entries[key] = (value, expiry)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key, factory):
+        """ Retrieves a value from the cache, calling the factory to create it if it is missing """
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+
+        # Share the result of a single call between concurrent misses for the same key
+        if key in self.pending:
+            return await asyncio.shield(self.pending[key], loop=self.loop)
+
+        future = asyncio.ensure_future(factory(), loop=self.loop)
+        self.pending[key] = future
+
+        try:
+            value = await asyncio.shield(future, loop=self.loop)
+        except:
+            if self.pending.get(key) is future:
+                del self.pending[key]
+
+            raise
+
+        # Only store the value if the key wasn't invalidated while it was being created
+        if self.pending.get(key) is future:
+            del self.pending[key]
+
+            if self.size > 0:
+                self._store(key, value)
+
+        return value
+
+    def put(self, key, value):
+        """ Stores a value in the cache, replacing any existing entry """
+        self.pending.pop(key, None)
+
+        if self.size > 0:
+            self._store(key, value)
+
+    def invalidate(self, *keys):
+        """ Removes the given keys from the cache """
+        for key in keys:
+            self.entries.pop(key, None)
+            self.pending.pop(key, None)
+
+    def clear(self):
+        """ Removes all entries from the cache """
+        self.entries.clear()
+        self.pending.clear()
+
+    def stats(self):
+        """ Retrieves the hit, miss and eviction counts of the cache """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries)
+        }
@@ -2,30 +2,88 @@
 Defines the Postgres migrator for moving data into BlazingDB from Postgres
 """
 
+import asyncio
+import collections
+import concurrent
+import contextlib
 import math
 import logging
 
+import numpy
 import pandas
 
 from blazingdb import exceptions
+from blazingdb.util import exponential_moving_avg
+from blazingdb.util.buffer import ReadAheadBuffer
 
 from .. import base
 
 
+class FetchSizer(object):
+    """ Adjusts the rows fetched in each chunk so frames come out close to a target size """
+
+    # pragma pylint: disable=too-few-public-methods
+
+    SMOOTHING = 0.5
+
+    def __init__(self, frame_size, fetch_count, history, **kwargs):
+        self.frame_size = frame_size
+        self.fetch_count = fetch_count
+        self.history = history
+
+        self.min_fetch_count = kwargs.get("min_fetch_count", 1)
+        self.max_fetch_count = kwargs.get("max_fetch_count", None)
+
+        self.bytes_per_row = exponential_moving_avg(self.SMOOTHING)
+        next(self.bytes_per_row)
+
+    def update(self, frame, frame_bytes):
+        """ Records the size of a fetched frame, returning the number of rows to fetch next """
+        if self.frame_size is None or frame.empty:
+            return self.fetch_count
+
+        bytes_per_row = self.bytes_per_row.send(frame_bytes / len(frame))
+
+        fetch_count = max(self.min_fetch_count, int(self.frame_size / max(bytes_per_row, 1)))
+        if self.max_fetch_count is not None:
+            fetch_count = min(self.max_fetch_count, fetch_count)
+
+        self.history.append({
+            "rows": len(frame),
+            "bytes": int(frame_bytes),
+            "bytes_per_row": bytes_per_row,
+            "fetch_count": fetch_count
+        })
+
+        self.fetch_count = fetch_count
+        return fetch_count
+
+
 class PostgresSource(base.BaseSource):
     """ Handles connecting and retrieving data from Postgres, and loading it into BlazingDB """
 
     CURSOR_NAME = __name__
     FETCH_COUNT = 20000
+    FETCH_HISTORY = 100
 
     def __init__(self, pool, schema, **kwargs):
-        super(PostgresSource, self).__init__()
+        super(PostgresSource, self).__init__(**kwargs)
         self.logger = logging.getLogger(__name__)
 
         self.pool = pool
         self.schema = schema
 
         self.fetch_count = kwargs.get("fetch_count", self.FETCH_COUNT)
+        self.frame_size = kwargs.get("frame_size", None)
+
+        self.min_fetch_count = kwargs.get("min_fetch_count", 1)
+        self.max_fetch_count = kwargs.get("max_fetch_count", None)
+
+        self.fetch_history = collections.deque(maxlen=self.FETCH_HISTORY)
+
+        self.prefetch = kwargs.get("prefetch", 0)
+        self.prefetch_bytes = kwargs.get("prefetch_bytes", None)
+        self.export_snapshot = kwargs.get("export_snapshot", True)
 
     async def close(self):
         """ Closes the given source and cleans up the connection """
@@ -35,7 +93,7 @@ class PostgresSource(base.BaseSource):
         schema = self.schema if schema is None else schema
         return ".".join([schema, table])
 
-    async def get_tables(self):
+    async def _retrieve_tables(self):
         """ Retrieves a list of the tables in this source """
         results = self.query(" ".join([
             "SELECT DISTINCT table_name FROM information_schema.tables",
@@ -48,7 +106,7 @@ class PostgresSource(base.BaseSource):
 
         return tables
 
-    async def get_columns(self, table):
+    async def _retrieve_columns(self, table):
         """ Retrieves a list of columns for the given table from the source """
         def _process_column(row):
             datatype = convert_datatype(row[1])
@@ -71,25 +129,228 @@ class PostgresSource(base.BaseSource):
 
         return columns
 
+    async def _retrieve_all_columns(self):
+        """ Retrieves the columns for every table in the schema in a single query """
+        results = self.query(" ".join([
+            "SELECT c.table_name, c.column_name, c.data_type, c.character_maximum_length",
+            "FROM information_schema.columns c JOIN information_schema.tables t",
+            "ON t.table_schema = c.table_schema AND t.table_name = c.table_name",
+            "WHERE c.table_schema = '{0}' AND t.table_type = 'BASE TABLE'".format(self.schema),
+            "ORDER BY c.table_name, c.ordinal_position"
+        ]))
+
+        frames = [frame async for frame in results]
+        if not frames:
+            return dict()
+
+        frame = pandas.concat(frames, ignore_index=True)
+        frame[2] = frame[2].map(DATATYPE_MAP)
+        frame[3] = frame[3].astype("object").where(frame[3].notnull(), None)
+
+        # Leave out tables with unsupported types, so get_columns reports them individually
+        unsupported = frame.loc[frame[2].isnull(), 0].unique()
+        frame = frame[~frame[0].isin(unsupported)]
+
+        all_columns = {
+            table: [
+                base.Column(name=name, type=datatype, size=int(size) if size is not None else None)
+                for name, datatype, size in zip(group[1], group[2], group[3])]
+            for table, group in frame.groupby(0, sort=False)}
+
+        self.logger.debug("Retrieved columns for %s tables from Postgres", len(all_columns))
+
+        return all_columns
+
     async def execute(self, query, *args):
         """ Executes a custom query against the source, ignoring the results """
         async with self.pool.acquire() as connection:
             await connection.execute(query, *args)
 
+    async def query_value(self, query, *args):
+        """ Performs a custom query against the source, returning the first value or None """
+        async with self.pool.acquire() as connection:
+            return await connection.fetchval(query, *args)
+
+    async def copy_query(self, query, output, *args, **kwargs):
+        """ Streams the results of a query to the given output using COPY ... TO STDOUT """
+        async with self.pool.acquire() as connection:
+            await connection.copy_from_query(query, *args, output=output, **kwargs)
+
+    async def _read_chunks(self, cursor, types):
+        """ Reads chunks from a cursor, yielding each frame with its size in bytes """
+        sizer = FetchSizer(self.frame_size, self.fetch_count, self.fetch_history,
+            min_fetch_count=self.min_fetch_count, max_fetch_count=self.max_fetch_count)
+
+        measure = self.frame_size is not None or self.prefetch_bytes is not None
+
+        fetch_count = self.fetch_count
+        while True:
+            chunk = await cursor.fetch(fetch_count)
+
+            if not chunk:
+                break
+
+            frame = build_frame(chunk, types)
+            frame_bytes = frame.memory_usage(index=False, deep=True).sum() if measure else 0
+
+            fetch_count = sizer.update(frame, frame_bytes)
+
+            yield frame, frame_bytes
+
+    async def _fetch_frames(self, connection, query, *args):
+        """ Retrieves the results of a query in chunks, within an open transaction """
+        statement = await connection.prepare(query)
+        types = [convert_type_name(attr.type.name) for attr in statement.get_attributes()]
+
+        cursor = await statement.cursor(*args)
+        chunks = self._read_chunks(cursor, types)
+
+        if not self.prefetch:
+            async for frame, _ in chunks:
+                yield frame
+
+            return
+
+        # Keep fetching from Postgres while the consumer processes earlier frames
+        buffer = ReadAheadBuffer(self.prefetch, self.prefetch_bytes, loop=self.loop)
+        task = asyncio.ensure_future(buffer.fill(chunks), loop=self.loop)
+
+        try:
+            while True:
+                frame = await buffer.get()
+
+                if frame is None:
+                    break
+
+                yield frame
+        finally:
+            task.cancel()
+
+            with contextlib.suppress(concurrent.futures.CancelledError):
+                await task
+
     async def query(self, query, *args):
         """ Performs a custom query against the source """
         async with self.pool.acquire() as connection:
             async with connection.transaction():
-                cursor = await connection.cursor(query, *args)
+                async for frame in self._fetch_frames(connection, query, *args):
+                    yield frame
+
+    async def _get_partitions(self, connection, identifier, partitions, key, predicate=None):
+        """ Generates the predicates splitting a table into the given number of partitions """
+        if key is not None:
+            low, high = await connection.fetchrow(" ".join([
+                "SELECT min({0}), max({0}) FROM {1}".format(key, identifier),
+                "WHERE {0}".format(predicate) if predicate is not None else ""
+            ]))
+
+            if low is None:
+                return ["TRUE"]
+
+            # Ranges are only split over integer keys, anything else is partitioned by ctid
+            if all(isinstance(bound, int) and not isinstance(bound, bool) for bound in (low, high)):
+                step = max(1, -(-(high - low + 1) // partitions))
+                predicates = [
+                    "{0} >= {1} AND {0} < {2}".format(key, bound, bound + step)
+                    for bound in range(low, high + 1, step)]
+
+                predicates[0] = "({0} OR {1} IS NULL)".format(predicates[0], key)
+                return predicates
+
+            self.logger.warning("Partition key %s of %s is not an integer (%s), using ctid instead",
+                key, identifier, type(low).__name__)
+
+        pages = await connection.fetchval(" ".join([
+            "SELECT pg_relation_size('{0}')".format(identifier),
+            "/ current_setting('block_size')::bigint"
+        ]))
+
+        if not pages:
+            return ["TRUE"]
+
+        step = max(1, -(-pages // partitions))
+        predicates = [
+            "ctid >= '({0},0)'::tid AND ctid < '({1},0)'::tid".format(bound, bound + step)
+            for bound in range(0, pages, step)]
+
+        # Leave the last partition unbounded in case the relation grew since it was measured
+        predicates[-1] = "ctid >= '({0},0)'::tid".format(step * (len(predicates) - 1))
+        return predicates
+
+    async def _read_partition(self, query, snapshot, partition, queue):
+        """ Reads a single partition on its own connection, placing frames on the queue """
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.transaction(isolation="repeatable_read", readonly=True):
+                    if snapshot is not None:
+                        await connection.execute(
+                            "SET TRANSACTION SNAPSHOT '{0}'".format(snapshot))
+
+                    async for frame in self._fetch_frames(connection, query):
+                        await queue.put((partition, frame, None))
+        except concurrent.futures.CancelledError:
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            await queue.put((partition, None, ex))
+        else:
+            await queue.put((partition, None, None))
+
+    async def query_partitions(self, table, columns, partitions, key=None, predicate=None):
+        """ Reads a table in partitions on separate connections, under a consistent snapshot """
+        # pragma pylint: disable=too-many-arguments,too-many-locals
+        if partitions <= 1:
+            results = super(PostgresSource, self).query_partitions(
+                table, columns, 1, predicate=predicate)
+
+            async for result in results:
+                yield result
+
+            return
+
+        identifier = self.get_identifier(table)
+        query = self.build_query(table, columns)
+
+        async with self.pool.acquire() as connection:
+            async with connection.transaction(isolation="repeatable_read", readonly=True):
+                snapshot = None
+                if self.export_snapshot:
+                    snapshot = await connection.fetchval("SELECT pg_export_snapshot()")
+
+                predicates = await self._get_partitions(
+                    connection, identifier, partitions, key, predicate)
+
+                if predicate is not None:
+                    predicates = [
+                        "({0}) AND ({1})".format(partition, predicate)
+                        for partition in predicates]
+
+                queue = asyncio.Queue(len(predicates), loop=self.loop)
+
+                self.logger.debug("Reading table %s in %s partition(s)", table, len(predicates))
+
+                tasks = [
+                    asyncio.ensure_future(self._read_partition(
+                        "{0} WHERE {1}".format(query, partition), snapshot, i, queue),
+                        loop=self.loop)
+                    for i, partition in enumerate(predicates)]
+
+                try:
+                    remaining = len(tasks)
 
-                while True:
-                    chunk = await cursor.fetch(self.fetch_count)
+                    while remaining:
+                        partition, frame, error = await queue.get()
 
-                    if not chunk:
-                        break
+                        if error is not None:
+                            raise error
 
-                    yield pandas.DataFrame.from_records(
-                        [tuple(record.values()) for record in chunk])
+                        if frame is None:
+                            remaining -= 1
+                            continue
+
+                        yield partition, frame
+                finally:
+                    for task in tasks:
+                        task.cancel()
 
 
 DATATYPE_MAP = {
@@ -110,6 +371,59 @@ DATATYPE_MAP = {
     "timestamp without time zone": "datetime"
 }
 
+TYPE_NAME_MAP = {
+    "bit": "bool", "bool": "bool",
+    "int2": "long", "int4": "long", "int8": "long",
+
+    "float4": "float", "float8": "float", "numeric": "float",
+
+    "bpchar": "str", "char": "str", "name": "str",
+    "text": "str", "varchar": "str",
+
+    "date": "date",
+    "timestamp": "datetime", "timestamptz": "datetime"
+}
+
+NUMPY_TYPES = {
+    "bool": "bool", "date": "datetime64[D]", "datetime": "datetime64[us]",
+    "float": "float64", "long": "int64"
+}
+
 def convert_datatype(datatype):
     """ Converts a PostgreSQL data type into a Python data type """
     return DATATYPE_MAP[datatype]
+
+def convert_type_name(type_name):
+    """ Converts the name of a PostgreSQL type (eg. int4) into a Python data type """
+    return TYPE_NAME_MAP.get(type_name, "str")
+
+def build_column(values, datatype):
+    """ Converts a list of values into a NumPy array of the given Python data type """
+    dtype = NUMPY_TYPES.get(datatype)
+    mask = numpy.fromiter((value is None for value in values), dtype="bool", count=len(values))
+
+    if dtype is not None and mask.any():
+        # Integers can only hold nulls as floats (NaN), and booleans only as objects
+        if dtype == "int64":
+            dtype = "float64"
+        elif dtype == "bool":
+            dtype = None
+
+    if dtype is not None:
+        try:
+            return numpy.array(values, dtype=dtype)
+        except (TypeError, ValueError):
+            pass
+
+    column = numpy.empty(len(values), dtype="object")
+    column[:] = values
+
+    return column
+
+def build_frame(records, types):
+    """ Builds a DataFrame column-wise from a list of records """
+    columns = {
+        i: build_column([record[i] for record in records], datatype)
+        for i, datatype in enumerate(types)}
+
+    return pandas.DataFrame(columns, columns=range(len(types)), copy=False)
@@ -27,9 +27,13 @@ class TableTrigger(BaseTrigger):
     async def _poll(self):
         pass
 
+    def _get_packets(self, table):  # pylint: disable=unused-argument
+        """ Retrieves any additional packets to include in the message for a table """
+        return []
+
     async def poll(self):
         async for table in self._poll():
             packet = packets.ImportTablePacket(self.source, table)
             msg_handle = handle.Handle(track_children=True)
 
-            yield messages.Message(packet, handle=msg_handle)
+            yield messages.Message(packet, *self._get_packets(table), handle=msg_handle)
@@ -4,6 +4,8 @@ Defines a trigger which simply retrieves / returns all tables from the given sou
 
 import logging
 
+from blazingdb.pipeline import packets
+
 from . import base
 
 
@@ -12,13 +14,25 @@ from . import base
 class SourceTrigger(base.TableTrigger):
     """ A simple trigger which returns all tables from a source """
 
-    def __init__(self, source):
+    def __init__(self, source, prefetch_columns=True):
         super(SourceTrigger, self).__init__(source)
         self.logger = logging.getLogger(__name__)
 
+        self.prefetch_columns = prefetch_columns
+        self.columns = dict()
+
+    def _get_packets(self, table):
+        if table not in self.columns:
+            return []
+
+        return [packets.DataColumnsPacket(self.columns[table])]
+
     async def _poll(self):
         tables = await self.source.get_tables()
 
+        if self.prefetch_columns:
+            self.columns = await self.source.get_all_columns()
+
         self.logger.info("Tables to be imported: %s", ", ".join(tables))
 
         for table in tables:
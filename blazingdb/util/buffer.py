@@ -0,0 +1,80 @@
+"""
+Defines the ReadAheadBuffer class, for producing items ahead of the consumer
+"""
+
+import asyncio
+import collections
+import concurrent
+
+
+class ReadAheadBuffer(object):
+    """ Buffers items read ahead of the consumer, bounded by a count and a size in bytes """
+
+    def __init__(self, max_items, max_bytes=None, loop=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+
+        self.items = collections.deque()
+        self.size = 0
+
+        self.done = False
+        self.error = None
+
+        self.changed = asyncio.Condition(loop=loop)
+
+    def _has_space(self, size):
+        # Always accept at least one item, even if it is larger than max_bytes
+        if not self.items:
+            return True
+
+        if len(self.items) >= self.max_items:
+            return False
+
+        return self.max_bytes is None or self.size + size <= self.max_bytes
+
+    async def put(self, item, size=0):
+        """ Adds an item to the buffer, waiting until there is space for it """
+        async with self.changed:
+            await self.changed.wait_for(lambda: self._has_space(size))
+
+            self.items.append((item, size))
+            self.size += size
+
+            self.changed.notify_all()
+
+    async def get(self):
+        """ Retrieves the next item from the buffer, returning None once it is exhausted """
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.items or self.done)
+
+            if not self.items:
+                if self.error is not None:
+                    raise self.error
+
+                return None
+
+            item, size = self.items.popleft()
+            self.size -= size
+
+            self.changed.notify_all()
+            return item
+
+    async def close(self, error=None):
+        """ Marks the buffer as complete, optionally with an error to raise to the consumer """
+        async with self.changed:
+            self.done = True
+            self.error = error
+
+            self.changed.notify_all()
+
+    async def fill(self, iterable):
+        """ Fills the buffer from an async iterable of (item, size) pairs """
+        try:
+            async for item, size in iterable:
+                await self.put(item, size)
+        except concurrent.futures.CancelledError:
+            raise
+        except Exception as ex:  # pylint: disable=broad-except
+            await self.close(ex)
+        else:
+            await self.close()
@@ -0,0 +1,106 @@
+"""
+Defines the DiskBudget class, for limiting the chunk files waiting on disk to be loaded
+"""
+
+import asyncio
+import collections
+import logging
+import os
+
+
+class DiskBudget(object):
+    """ Blocks writers while chunk files exceed a limit in bytes, cleaning them up once loaded """
+
+    # pragma pylint: disable=too-many-instance-attributes
+
+    DEFAULT_CLEANUP = True
+
+    def __init__(self, limit=None, loop=None, **kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.limit = limit
+        self.cleanup = kwargs.get("cleanup", self.DEFAULT_CLEANUP)
+
+        self.files = dict()
+        self.waiters = collections.deque()
+
+        self.pending_bytes = 0
+        self.loaded_bytes = 0
+        self.loaded_files = 0
+        self.failed_bytes = 0
+        self.failed_files = 0
+        self.deleted_files = 0
+
+    def _has_space(self):
+        return self.limit is None or self.pending_bytes < self.limit
+
+    def _wake_waiters(self):
+        while self.waiters and self._has_space():
+            waiter = self.waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def acquire(self):
+        """ Waits until the bytes of chunk files waiting to be loaded are under the limit """
+        if not self.waiters and self._has_space():
+            return
+
+        self.logger.debug("Waiting for %s byte(s) of chunk files to be loaded", self.pending_bytes)
+
+        waiter = self.loop.create_future()
+        self.waiters.append(waiter)
+
+        await waiter
+
+    def register(self, file_path, size=None):
+        """ Records a chunk file which has been written, and is waiting to be loaded """
+        if size is None:
+            size = os.path.getsize(file_path)
+
+        self.pending_bytes += size - self.files.get(file_path, 0)
+        self.files[file_path] = size
+
+    def release(self, file_path, loaded=True):
+        """ Records a chunk file has been loaded (or failed to), deleting it if loaded """
+        if file_path not in self.files:
+            return
+
+        size = self.files.pop(file_path)
+        self.pending_bytes -= size
+
+        if not loaded:
+            self.failed_bytes += size
+            self.failed_files += 1
+        else:
+            self.loaded_bytes += size
+            self.loaded_files += 1
+
+            # Failed chunks are kept on disk, so they can be inspected or loaded again
+            if self.cleanup:
+                self._delete(file_path)
+
+        self._wake_waiters()
+
+    def _delete(self, file_path):
+        try:
+            os.unlink(file_path)
+        except FileNotFoundError:
+            return
+
+        self.deleted_files += 1
+
+    def stats(self):
+        """ Retrieves the bytes and files waiting to be loaded, against those already loaded """
+        return {
+            "limit": self.limit,
+            "pending_bytes": self.pending_bytes,
+            "pending_files": len(self.files),
+            "loaded_bytes": self.loaded_bytes,
+            "loaded_files": self.loaded_files,
+            "failed_bytes": self.failed_bytes,
+            "failed_files": self.failed_files,
+            "deleted_files": self.deleted_files,
+            "waiting": len(self.waiters)
+        }
@@ -0,0 +1,131 @@
+"""
+Defines the AdaptiveLimiter class, for limiting concurrent requests based on observed latency
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+from . import exponential_moving_avg
+
+
+class AdaptiveLimiter(object):
+    """ Limits concurrent requests, adjusting the limit by AIMD on latency and overload errors """
+
+    # pragma pylint: disable=too-many-instance-attributes
+
+    DEFAULT_BACKOFF_RATIO = 0.5
+    DEFAULT_LATENCY_TOLERANCE = 2.0
+    DEFAULT_MIN_LIMIT = 1
+    DEFAULT_SMOOTHING = 0.1
+
+    def __init__(self, limit, loop=None, **kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.limit = float(limit)
+        self.min_limit = kwargs.get("min_limit", self.DEFAULT_MIN_LIMIT)
+        self.max_limit = kwargs.get("max_limit", limit)
+
+        self.backoff_ratio = kwargs.get("backoff_ratio", self.DEFAULT_BACKOFF_RATIO)
+        self.latency_tolerance = kwargs.get("latency_tolerance", self.DEFAULT_LATENCY_TOLERANCE)
+
+        smoothing = kwargs.get("smoothing", self.DEFAULT_SMOOTHING)
+        self.latency_avg = exponential_moving_avg(smoothing)
+        self.wait_avg = exponential_moving_avg(smoothing)
+
+        next(self.latency_avg)
+        next(self.wait_avg)
+
+        self.latency = None
+        self.queue_wait = 0.0
+        self.last_decrease = 0.0
+
+        self.in_flight = 0
+        self.waiters = collections.deque()
+
+    def _wake_waiters(self):
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+
+            if waiter.done():
+                continue
+
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    def _increase(self):
+        """ Additively increases the limit, by one for each full window of requests """
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake_waiters()
+
+    def _decrease(self, started):
+        """ Multiplicatively decreases the limit, once for each window of requests """
+        if started < self.last_decrease:
+            return
+
+        previous = int(self.limit)
+
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        self.last_decrease = time.monotonic()
+
+        self.logger.debug("Decreased request limit from %s to %s", previous, int(self.limit))
+
+    async def acquire(self):
+        """ Waits until a request can be performed, returning the time the request started """
+        start = time.monotonic()
+
+        if self.waiters or self.in_flight >= int(self.limit):
+            waiter = self.loop.create_future()
+            self.waiters.append(waiter)
+
+            try:
+                await waiter
+            except BaseException:
+                # Cancelled waiters give up their place, or the slot they were just handed
+                if not waiter.done() or waiter.cancelled():
+                    self.waiters.remove(waiter)
+                else:
+                    self.in_flight -= 1
+                    self._wake_waiters()
+
+                raise
+        else:
+            self.in_flight += 1
+
+        started = time.monotonic()
+        self.queue_wait = self.wait_avg.send(started - start)
+
+        return started
+
+    def release(self, started, overloaded=False):
+        """ Completes a request, adjusting the limit based on its latency and outcome """
+        self.in_flight -= 1
+
+        latency = time.monotonic() - started
+        baseline = self.latency
+
+        if overloaded or (baseline and latency > baseline * self.latency_tolerance):
+            self._decrease(started)
+        else:
+            self._increase()
+
+        if not overloaded:
+            self.latency = self.latency_avg.send(latency)
+
+        self._wake_waiters()
+
+    def backoff(self, started):
+        """ Decreases the limit after an overload was reported for a completed request """
+        self._decrease(started)
+
+    def stats(self):
+        """ Retrieves the current state of the limiter """
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self.waiters),
+            "queue_wait": self.queue_wait,
+            "latency": self.latency
+        }
@@ -0,0 +1,219 @@
+"""
+Defines the FrameSerializer class, for writing pandas.DataFrames as delimited text
+"""
+
+import csv
+import datetime
+import io
+import re
+import zlib
+
+import numpy
+import pandas
+
+
+ESCAPE_CHAR = "\\"
+DATE_FORMAT = "%Y-%m-%d"
+
+# Joins strings to search them all at once, it must not be a field terminator or wrapper
+SEARCH_SEPARATOR = "\0"
+
+FACTORIZED_TYPES = ["date", "datetime"]
+
+def _escapes_escape_char():
+    """ Checks if the csv module escapes the escape character, rather than quoting the field """
+    output = io.StringIO()
+
+    writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL, doublequote=False, escapechar="\\")
+    writer.writerow(["\\", ""])
+
+    return output.getvalue().startswith("\\\\")
+
+# Python 3.10 changed how the csv module handles the escape character, match whichever is in use
+ESCAPES_ESCAPE_CHAR = _escapes_escape_char()
+
+def _format_date(value):
+    """ Formats datetimes as dates, the same as pandas does for a datetime column """
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATE_FORMAT)
+
+    return str(value)
+
+
+class FileMetadata(object):
+    """ Describes the rows, size and checksum of a file, and if any row ends in an empty field """
+
+    def __init__(self):
+        self.rows = 0
+        self.size = 0
+        self.checksum = 0
+        self.trailing_empty = False
+
+    def update(self, data, rows, trailing_empty):
+        """ Records a block of encoded data written to the file """
+        self.rows += rows
+        self.size += len(data)
+
+        self.checksum = zlib.crc32(data, self.checksum)
+        self.trailing_empty = self.trailing_empty or trailing_empty
+
+
+class FrameSerializer(object):
+    """ Serializes frames as delimited text, in the same format pandas.to_csv would with csv """
+
+    DEFAULT_BLOCK_ROWS = 100000
+
+    def __init__(self, field_terminator, line_terminator, field_wrapper, **kwargs):
+        self.field_terminator = field_terminator
+        self.line_terminator = line_terminator
+        self.field_wrapper = field_wrapper
+
+        self.block_rows = kwargs.get("block_rows", self.DEFAULT_BLOCK_ROWS)
+        self.formatters = dict()
+
+        special_chars = {field_terminator, field_wrapper, ESCAPE_CHAR, *line_terminator}
+        quoted_chars = {field_terminator, *line_terminator}
+
+        if not ESCAPES_ESCAPE_CHAR:
+            quoted_chars.add(ESCAPE_CHAR)
+
+        self.special_pattern = re.compile("[{0}]".format(re.escape("".join(special_chars))))
+        self.quoted_pattern = "[{0}]".format(re.escape("".join(quoted_chars)))
+
+    @staticmethod
+    def _format_numbers(values):
+        if values.dtype.kind != "f":
+            return values.values
+
+        # Narrower floats are formatted as themselves, widening them would show rounding errors
+        if values.dtype.itemsize < 8:
+            numbers = values.values.astype(str).astype(object)
+        else:
+            numbers = values.values.astype(object)
+
+        numbers[numpy.isnan(values.values)] = ""
+
+        return numbers
+
+    @staticmethod
+    def _format_dates(values):
+        strings = numpy.datetime_as_string(values.values.astype("datetime64[D]"), unit="D")
+        strings = strings.astype(object)
+
+        strings[values.isnull().values] = ""
+        return strings
+
+    def _find_special(self, strings):
+        """ Finds the strings containing special characters, with a single search over them all """
+        lengths = numpy.fromiter(map(len, strings), dtype=numpy.int64, count=len(strings))
+        ends = numpy.cumsum(lengths + 1)
+
+        joined = SEARCH_SEPARATOR.join(strings)
+        positions = numpy.fromiter(
+            (match.start() for match in self.special_pattern.finditer(joined)), dtype=numpy.int64)
+
+        special = numpy.zeros(len(strings), dtype=bool)
+        special[numpy.searchsorted(ends, positions, side="right")] = True
+
+        return special
+
+    def _escape_strings(self, strings):
+        """ Escapes and quotes strings containing special characters the same way as csv """
+        # Most strings contain no special characters, so only process those which do
+        special = self._find_special(strings)
+        if not special.any():
+            return strings
+
+        matches = pandas.Series(strings[special])
+        quoted = matches.str.contains(self.quoted_pattern)
+
+        # Backslashes are escaped before writing, as BlazingDB treats them as escapes
+        matches = matches.str.replace(ESCAPE_CHAR, ESCAPE_CHAR * 2, regex=False)
+
+        if ESCAPES_ESCAPE_CHAR:
+            matches = matches.str.replace(ESCAPE_CHAR, ESCAPE_CHAR * 2, regex=False)
+
+        matches = matches.str.replace(
+            self.field_wrapper, ESCAPE_CHAR + self.field_wrapper, regex=False)
+
+        matches[quoted] = self.field_wrapper + matches[quoted] + self.field_wrapper
+        strings[special] = matches.values
+
+        return strings
+
+    def _format_objects(self, values):
+        inferred = pandas.api.types.infer_dtype(values, skipna=True)
+
+        if inferred in FACTORIZED_TYPES:
+            # Dates repeat across many rows, so only format each distinct value once
+            codes, uniques = pandas.factorize(values)
+            strings = numpy.array([_format_date(value) for value in uniques] + [""], dtype=object)
+
+            return self._escape_strings(strings)[codes]
+
+        strings = values if inferred == "string" else values.astype(str)
+        strings = strings.where(values.notnull(), "").values.astype(object)
+
+        return self._escape_strings(strings)
+
+    def _format_timezone_dates(self, values):
+        strings = values.dt.strftime(DATE_FORMAT)
+        strings = strings.where(values.notnull(), "").values.astype(object)
+
+        return self._escape_strings(strings)
+
+    def _get_formatters(self, frame):
+        """ Retrieves the formatter for each column of the frame, cached per schema """
+        schema = tuple(zip(frame.columns, frame.dtypes))
+
+        if schema not in self.formatters:
+            formatters = []
+
+            for _, dtype in schema:
+                if dtype.kind in "biuf":
+                    formatters.append(self._format_numbers)
+                elif pandas.api.types.is_datetime64_dtype(dtype):
+                    formatters.append(self._format_dates)
+                elif pandas.api.types.is_datetime64tz_dtype(dtype):
+                    formatters.append(self._format_timezone_dates)
+                else:
+                    formatters.append(self._format_objects)
+
+            # Rows are formatted in one operation each, so escape % in the terminators
+            row_format = self.field_terminator.replace("%", "%%").join(["%s"] * len(formatters))
+            row_format += self.line_terminator.replace("%", "%%")
+
+            self.formatters[schema] = (formatters, row_format)
+
+        return self.formatters[schema]
+
+    def _serialize_block(self, frame, formatters, row_format):
+        columns = [
+            formatter(frame.iloc[:, i]).tolist()
+            for i, formatter in enumerate(formatters)]
+
+        # csv quotes an empty field when it is the only one in the row
+        if len(columns) == 1:
+            empty = self.field_wrapper * 2
+            columns[0] = [value if value != "" else empty for value in columns[0]]
+
+        trailing_empty = "" in columns[-1]
+        return "".join(map(row_format.__mod__, zip(*columns))), trailing_empty
+
+    def iter_blocks(self, frame):
+        """ Generates blocks of text with their row count, and if any row ends in an empty field """
+        if frame.empty:
+            return
+
+        formatters, row_format = self._get_formatters(frame)
+
+        for start in range(0, frame.shape[0], self.block_rows):
+            block = frame.iloc[start:start + self.block_rows]
+            text, trailing_empty = self._serialize_block(block, formatters, row_format)
+
+            yield text, block.shape[0], trailing_empty
+
+    def serialize(self, frame):
+        """ Generates blocks of text from the rows of the frame """
+        for text, _, _ in self.iter_blocks(frame):
+            yield text
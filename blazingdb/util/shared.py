@@ -0,0 +1,124 @@
+"""
+Defines the SharedFrame class, for passing pandas.DataFrames between processes in shared memory
+"""
+
+import mmap
+import os
+import os.path
+import pickle
+import tempfile
+import uuid
+
+import numpy
+import pandas
+
+
+SHARED_MEMORY_FOLDER = "/dev/shm"
+FILE_PREFIX = "blazingdb-"
+
+# Aligns columns in the shared memory, so arrays can be mapped directly
+ALIGNMENT = 64
+
+def _get_folder():
+    if os.path.isdir(SHARED_MEMORY_FOLDER):
+        return SHARED_MEMORY_FOLDER
+
+    return tempfile.gettempdir()
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SharedFrame(object):
+    """ A handle to a frame in shared memory, only the handle is pickled between processes """
+
+    def __init__(self, path, size, index, columns):
+        self.path = path
+        self.size = size
+
+        self.index = index
+        self.columns = columns
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.unlink()
+
+    @staticmethod
+    def _build_segments(frame):
+        """ Generates the name, layout and data of each column of the frame """
+        for i, name in enumerate(frame.columns):
+            column = frame.iloc[:, i]
+
+            # Plain NumPy columns are copied into memory as is, anything else is pickled
+            if isinstance(column.dtype, numpy.dtype) and column.dtype != object:
+                array = numpy.ascontiguousarray(column.values)
+                yield name, array.dtype.str, array.view(numpy.uint8)
+                continue
+
+            # Extension columns (eg. timezone aware dates) would lose their dtype as NumPy arrays
+            values = column.values if column.dtype == object else column.array
+            yield name, None, pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def create(cls, frame):
+        """ Copies a frame into shared memory, returning a handle which can be read elsewhere """
+        segments = list(cls._build_segments(frame))
+        index = pickle.dumps(frame.index, protocol=pickle.HIGHEST_PROTOCOL)
+
+        columns = []
+        offset = _align(len(index))
+
+        for name, dtype, data in segments:
+            columns.append((name, dtype, offset, len(data)))
+            offset = _align(offset + len(data))
+
+        path = os.path.join(_get_folder(), FILE_PREFIX + uuid.uuid4().hex)
+        descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+
+        try:
+            os.ftruncate(descriptor, offset)
+
+            with mmap.mmap(descriptor, offset) as memory:
+                memory[:len(index)] = index
+
+                for (_, _, start, length), (_, _, data) in zip(columns, segments):
+                    memory[start:start + length] = data
+        except:
+            os.unlink(path)
+            raise
+        finally:
+            os.close(descriptor)
+
+        return cls(path, offset, len(index), columns)
+
+    def read(self):
+        """ Maps the frame from shared memory, arrays reference the memory rather than a copy """
+        with open(self.path, "rb") as data_file:
+            # Copy-on-write, so the frame can be modified without affecting the shared memory
+            memory = mmap.mmap(data_file.fileno(), self.size, access=mmap.ACCESS_COPY)
+
+        index = pickle.loads(memory[:self.index])
+
+        arrays = dict()
+        for i, (_, dtype, offset, length) in enumerate(self.columns):
+            if dtype is None:
+                arrays[i] = pickle.loads(memory[offset:offset + length])
+            else:
+                dtype = numpy.dtype(dtype)
+                arrays[i] = numpy.frombuffer(memory, dtype=dtype,
+                    count=length // dtype.itemsize, offset=offset)
+
+        # The memory is unmapped once the arrays (and any frame built from them) are collected
+        frame = pandas.DataFrame(arrays, index=index, copy=False)
+        frame.columns = [name for name, _, _, _ in self.columns]
+
+        return frame
+
+    def unlink(self):
+        """ Removes the frame from shared memory, frames already read remain valid """
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
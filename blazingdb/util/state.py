@@ -0,0 +1,131 @@
+"""
+Defines the state stores used to persist the watermarks of incremental imports, including:
+ - MemoryStateStore
+ - SqliteStateStore
+"""
+
+import abc
+import datetime
+import logging
+import math
+import sqlite3
+
+import numpy
+import pandas
+
+
+def normalize_value(value):
+    """ Converts a value retrieved from a source into a plain Python value, or None if missing """
+    if value is None or value is pandas.NaT:
+        return None
+
+    if isinstance(value, pandas.Timestamp):
+        return value.to_pydatetime()
+
+    if isinstance(value, numpy.generic):
+        value = value.item()
+
+    if isinstance(value, float) and math.isnan(value):
+        return None
+
+    return value
+
+
+class BaseStateStore(object, metaclass=abc.ABCMeta):
+    """ Base class for stores persisting the watermark of each table between imports """
+
+    @abc.abstractmethod
+    async def get_watermark(self, table):
+        """ Retrieves the last watermark imported for a table, or None if it hasn't been """
+
+    @abc.abstractmethod
+    async def set_watermark(self, table, value):
+        """ Stores the last watermark imported for a table """
+
+    async def clear_watermark(self, table):
+        """ Removes the watermark for a table, so it is imported in full next time """
+        await self.set_watermark(table, None)
+
+    def close(self):
+        """ Closes the store """
+
+
+class MemoryStateStore(BaseStateStore):
+    """ Stores watermarks in memory, for the lifetime of the process """
+
+    def __init__(self):
+        self.watermarks = dict()
+
+    async def get_watermark(self, table):
+        return self.watermarks.get(table)
+
+    async def set_watermark(self, table, value):
+        self.watermarks[table] = normalize_value(value)
+
+
+class SqliteStateStore(BaseStateStore):
+    """ Stores watermarks in a local SQLite database """
+
+    DECODERS = {
+        "int": int,
+        "float": float,
+        "datetime": lambda value: pandas.Timestamp(value).to_pydatetime(),
+        "date": lambda value: datetime.datetime.strptime(value, "%Y-%m-%d").date(),
+        "str": str
+    }
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(" ".join([
+            "CREATE TABLE IF NOT EXISTS watermarks",
+            "(table_name TEXT PRIMARY KEY, kind TEXT NOT NULL, value TEXT NOT NULL)"
+        ]))
+
+        self.connection.commit()
+
+    @staticmethod
+    def _encode(value):
+        # datetime is a subclass of date, and bool of int, so the order of the checks matters
+        if isinstance(value, datetime.datetime):
+            return "datetime", value.isoformat()
+        if isinstance(value, datetime.date):
+            return "date", value.isoformat()
+        if isinstance(value, int) and not isinstance(value, bool):
+            return "int", str(value)
+        if isinstance(value, float):
+            return "float", repr(value)
+        if isinstance(value, str):
+            return "str", value
+
+        raise TypeError("Unsupported watermark type, {0}".format(type(value).__name__))
+
+    async def get_watermark(self, table):
+        row = self.connection.execute(
+            "SELECT kind, value FROM watermarks WHERE table_name = ?", (table,)).fetchone()
+
+        if row is None:
+            return None
+
+        kind, value = row
+        return self.DECODERS[kind](value)
+
+    async def set_watermark(self, table, value):
+        value = normalize_value(value)
+
+        with self.connection:
+            if value is None:
+                self.connection.execute("DELETE FROM watermarks WHERE table_name = ?", (table,))
+                return
+
+            kind, encoded = self._encode(value)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO watermarks (table_name, kind, value) VALUES (?, ?, ?)",
+                (table, kind, encoded))
+
+        self.logger.debug("Stored watermark %s for table %s", value, table)
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,148 @@
+"""
+Unit tests for the BatchStage
+"""
+
+import asyncio
+import gc
+import timeit
+import unittest
+
+import numpy
+import pandas
+
+from blazingdb.pipeline import packets
+from blazingdb.pipeline.messages import Message
+from blazingdb.pipeline.stages.batch import BatchStage, FrameBuffer
+
+
+def legacy_batches(frames, batch_size):
+    """ Batches frames the way BatchStage did before using a FrameBuffer, for comparison """
+    frame_data = frames[0]
+
+    for next_frame in frames[1:] + [None]:
+        while True:
+            memory_usage = frame_data.memory_usage().sum()
+            row_count = frame_data.shape[0]
+
+            if memory_usage < batch_size:
+                break
+
+            batch_rows = int(batch_size / memory_usage * row_count)
+
+            yield frame_data.iloc[:batch_rows].copy()
+            frame_data = frame_data.iloc[batch_rows:]
+
+        frame_data = frame_data.copy()
+        gc.collect()
+
+        if next_frame is not None:
+            frame_data = pandas.concat([frame_data, next_frame])
+
+    yield frame_data
+
+
+class BatchPerformanceTests(unittest.TestCase):
+    """ Tests the performance of batching many small frames """
+
+    FRAME_COUNT = 10000
+    FRAME_ROWS = 50
+
+    # The previous implementation collects garbage after every frame, so only time a sample
+    LEGACY_FRAME_COUNT = 200
+
+    BATCH_SIZE = 1024 * 1024
+
+    def setUp(self):
+        self.frames = [
+            pandas.DataFrame({
+                "id": numpy.arange(i * self.FRAME_ROWS, (i + 1) * self.FRAME_ROWS),
+                "value": numpy.random.random(self.FRAME_ROWS),
+                "name": ["name"] * self.FRAME_ROWS
+            })
+            for i in range(self.FRAME_COUNT)]
+
+    def _buffer_batches(self):
+        buffer = FrameBuffer(self.BATCH_SIZE)
+        batches = []
+
+        for frame in self.frames:
+            buffer.append(frame, frame.memory_usage(index=False).sum())
+            batches.extend(batch for batch, _ in buffer.batches())
+
+        remaining = buffer.flush()
+        if remaining is not None:
+            batches.append(remaining[0])
+
+        return batches
+
+    def test_batch_frames(self):
+        """ Compares the time taken to batch small frames with the previous implementation """
+        batches = self._buffer_batches()
+        self.assertEqual(sum(len(batch) for batch in batches), self.FRAME_COUNT * self.FRAME_ROWS)
+        self.assertTrue(numpy.array_equal(
+            pandas.concat(batches)["id"].values, numpy.arange(self.FRAME_COUNT * self.FRAME_ROWS)))
+
+        buffer_time = timeit.timeit(self._buffer_batches, number=1)
+        legacy_time = timeit.timeit(lambda: list(legacy_batches(
+            self.frames[:self.LEGACY_FRAME_COUNT], self.BATCH_SIZE)), number=1)
+
+        buffer_rate = self.FRAME_COUNT / buffer_time
+        legacy_rate = self.LEGACY_FRAME_COUNT / legacy_time
+
+        print("Frames batched per second: {0}, previously {1} ({2:.1f}x faster)".format(
+            int(buffer_rate), int(legacy_rate), buffer_rate / legacy_rate))
+
+
+class RecordingSystem(object):
+    """ Records the messages forwarded by a stage, in place of a System """
+
+    def __init__(self):
+        self.messages = []
+
+    async def enqueue(self, message):
+        """ Records the forwarded message """
+        self.messages.append(message)
+
+
+class BatchStageTests(unittest.TestCase):
+    """ Tests the messages forwarded by the BatchStage """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.system = RecordingSystem()
+        self.initial_id = None
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _process(self, stage, *message_packets):
+        message = Message(*message_packets, initial_id=self.initial_id)
+        message.system = self.system
+
+        self.initial_id = message.initial_id
+        self.loop.run_until_complete(stage.process(message))
+
+    def _forwarded(self, packet_type):
+        return [
+            packet for message in self.system.messages
+            for packet in message.get_packets(packet_type)]
+
+    def test_complete_with_empty_buffer(self):
+        """ Tests the DataCompletePacket is forwarded when no rows are left to flush """
+        stage = BatchStage(max_rows=10, loop=self.loop)
+        frame = pandas.DataFrame({"id": numpy.arange(20)})
+
+        self._process(stage, packets.DataFramePacket(frame, 0))
+        self._process(stage, packets.DataCompletePacket())
+
+        self.assertEqual(len(self._forwarded(packets.DataCompletePacket)), 1)
+        self.assertEqual([len(pkt.frame) for pkt in self._forwarded(packets.DataFramePacket)],
+            [10, 10])
+
+    def test_complete_empty_stream(self):
+        """ Tests the DataCompletePacket is forwarded for a stream without any frames """
+        stage = BatchStage(max_rows=10, loop=self.loop)
+        self._process(stage, packets.DataCompletePacket())
+
+        self.assertEqual(len(self._forwarded(packets.DataCompletePacket)), 1)
+        self.assertEqual(self._forwarded(packets.DataFramePacket), [])
@@ -0,0 +1,106 @@
+"""
+Unit tests for the FileOutputStage
+"""
+
+import csv
+import datetime
+import gc
+import os.path
+import tempfile
+import timeit
+import unittest
+
+import numpy
+import pandas
+
+from blazingdb.pipeline import packets
+from blazingdb.pipeline.stages import load
+
+
+def legacy_write_frame(frame, file_path, format_pkt):
+    """ Writes a data frame to disk the way write_frame did previously, for comparison """
+    def _escape_backslash(item):
+        return item.replace("\\", "\\\\") if isinstance(item, str) else item
+
+    for name in frame.select_dtypes(include=["object"]).columns:
+        frame[name] = frame[name].apply(_escape_backslash)
+
+    gc.collect()
+    frame.to_csv(file_path, sep=format_pkt.field_terminator,
+        lineterminator=format_pkt.line_terminator, quotechar=format_pkt.field_wrapper,
+        quoting=csv.QUOTE_MINIMAL, doublequote=False, escapechar="\\",
+        header=False, index=False, date_format=load.BLAZING_DATE_FORMAT)
+
+
+class WriteFramePerformanceTests(unittest.TestCase):
+    """ Tests the performance of writing frames to chunk files """
+
+    ROW_COUNT = 200000
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.format_pkt = packets.DataFormatPacket("|", "\n", "\"")
+
+        dates = pandas.date_range("2017-01-01", periods=self.ROW_COUNT, freq="min").values.copy()
+        dates[::100] = numpy.datetime64("NaT")
+
+        names = numpy.array(["name {0}".format(i) for i in range(self.ROW_COUNT)], dtype=object)
+        names[::50] = "back\\slash | \"quoted\""
+        names[::70] = None
+
+        self.frame = pandas.DataFrame({
+            "id": numpy.arange(self.ROW_COUNT),
+            "value": numpy.random.random(self.ROW_COUNT),
+            "name": names,
+            "created": dates,
+            "day": [datetime.date(2017, 1, 1 + i % 28) for i in range(self.ROW_COUNT)]
+        })
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def _write(self, write_func, filename, frame=None):
+        file_path = os.path.join(self.folder.name, filename)
+        write_func((frame if frame is not None else self.frame).copy(), file_path, self.format_pkt)
+
+        return file_path
+
+    def _read_both(self, frame):
+        with open(self._write(load.write_frame, "current.dat", frame), "rb") as data_file:
+            current_data = data_file.read()
+
+        with open(self._write(legacy_write_frame, "legacy.dat", frame), "rb") as data_file:
+            legacy_data = data_file.read()
+
+        return current_data, legacy_data
+
+    def test_write_frame_types(self):
+        """ Tests write_frame formats datetime objects as dates, and float32 without widening """
+        datetimes = [datetime.datetime(2017, 1, 2, 3, 4), None, datetime.datetime(2017, 1, 3)]
+        timestamps = [pandas.Timestamp("2017-01-02 22:00"), datetime.date(2017, 1, 4), None]
+
+        frame = pandas.DataFrame({
+            "datetimes": pandas.Series(datetimes, dtype=object),
+            "timestamps": pandas.Series(timestamps, dtype=object),
+            "small": numpy.array([0.1, numpy.nan, 1e20], dtype=numpy.float32),
+            "half": numpy.array([0.1, 2.5, numpy.nan], dtype=numpy.float16)
+        })
+
+        with open(self._write(load.write_frame, "current.dat", frame), "rb") as data_file:
+            current_data = data_file.read()
+
+        # Newer versions of pandas ignore date_format for Timestamp objects, so compare directly
+        self.assertEqual(current_data,
+            b"2017-01-02|2017-01-02|0.1|0.1\n|2017-01-04||2.5\n2017-01-03||1e+20|\n")
+
+    def test_write_frame(self):
+        """ Compares write_frame against the previous implementation """
+        current_data, legacy_data = self._read_both(self.frame)
+        self.assertEqual(current_data, legacy_data)
+
+        current_time = timeit.timeit(lambda: self._write(load.write_frame, "current.dat"), number=3)
+        legacy_time = timeit.timeit(lambda: self._write(legacy_write_frame, "legacy.dat"), number=3)
+
+        print("Rows written per second: {0}, previously {1} ({2:.1f}x faster)".format(
+            int(self.ROW_COUNT * 3 / current_time), int(self.ROW_COUNT * 3 / legacy_time),
+            legacy_time / current_time))
@@ -0,0 +1,133 @@
+"""
+Load tests for the BlazingConnector and import stages, run against a stand-in BlazingDB server
+"""
+
+import asyncio
+import collections
+import os
+import tempfile
+import time
+import unittest
+
+from blazingdb.pipeline import packets
+from blazingdb.pipeline.stages import CreateTableStage, FileImportStage
+from blazingdb.sources import base
+from blazingdb.sources.blazing import BlazingConnector, BlazingSource
+
+from .server import FakeBlazingServer
+
+
+class LoadHarness(object):
+    """ Generates requests against a server, recording the latency of each type of request """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.latencies = collections.defaultdict(list)
+        self.durations = collections.defaultdict(float)
+        self.errors = collections.Counter()
+
+    async def run(self, request_type, callback, count, concurrency):
+        """ Calls the callback with indices up to count, keeping concurrency calls in flight """
+        indices = iter(range(count))
+
+        async def _worker():
+            for i in indices:
+                start = time.monotonic()
+
+                try:
+                    await callback(i)
+                except Exception:  # pylint: disable=broad-except
+                    self.errors[request_type] += 1
+
+                self.latencies[request_type].append(time.monotonic() - start)
+
+        start = time.monotonic()
+        await asyncio.gather(*[_worker() for _ in range(concurrency)], loop=self.loop)
+
+        self.durations[request_type] += time.monotonic() - start
+
+    @staticmethod
+    def _percentile(values, percent):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def report(self):
+        """ Prints requests/s and p50/p99 latency for each type of request """
+        for request_type, latencies in sorted(self.latencies.items()):
+            print("{0}: {1:.1f} requests/s, p50={2:.1f}ms, p99={3:.1f}ms, errors={4}".format(
+                request_type, len(latencies) / self.durations[request_type],
+                self._percentile(latencies, 50) * 1000, self._percentile(latencies, 99) * 1000,
+                self.errors[request_type]))
+
+
+class ConnectorLoadTests(unittest.TestCase):
+    """ Measures the BlazingConnector and import stages against a FakeBlazingServer """
+
+    REQUEST_COUNT = 500
+    CONCURRENCY = 20
+
+    COLUMNS = [base.Column("id", "long", None), base.Column("name", "str", 32)]
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.folder = tempfile.TemporaryDirectory()
+
+        self.user_folder = os.path.join(self.folder.name, "blazing")
+        os.makedirs(os.path.join(self.user_folder, "data"))
+
+        self.server = FakeBlazingServer(self.user_folder, loop=self.loop,
+            latency={"query": 0.002}, max_concurrency={"query": 10})
+
+        port = self.loop.run_until_complete(self.server.start())
+        self.connector = BlazingConnector("127.0.0.1", "blazing", "password",
+            loop=self.loop, https=False, port=port)
+
+        self.destination = BlazingSource(self.connector, "test")
+        self.harness = LoadHarness(self.loop)
+
+    def tearDown(self):
+        self.connector.close()
+
+        self.loop.run_until_complete(self.server.stop())
+        self.loop.close()
+
+        self.folder.cleanup()
+
+    def _write_chunk(self, index, rows):
+        file_path = os.path.join(self.user_folder, "data", "table_{0}.dat".format(index))
+
+        with open(file_path, "w", newline="") as data_file:
+            data_file.writelines("{0}|name {0}\n".format(i) for i in range(rows))
+
+        return file_path
+
+    def test_connector_load(self):
+        """ Measures metadata, DDL and load requests performed through the pipeline stages """
+        # pragma pylint: disable=protected-access
+        create_stage = CreateTableStage()
+        import_stage = FileImportStage(self.folder.name, "blazing", loop=self.loop)
+
+        format_pkt = packets.DataFormatPacket("|", "\n", "\"")
+        chunks = [self._write_chunk(i, 1000) for i in range(10)]
+
+        async def _create(i):
+            await create_stage._perform_query(self.destination, str(i), self.COLUMNS)
+
+        async def _describe(i):
+            await self.destination._retrieve_columns(str(i % self.REQUEST_COUNT))
+
+        async def _load(i):
+            file_pkt = packets.DataFilePacket(chunks[i % len(chunks)])
+            await import_stage._load_chunk(self.destination, file_pkt, "0", format_pkt)
+
+        self.loop.run_until_complete(self.harness.run(
+            "create", _create, self.REQUEST_COUNT, self.CONCURRENCY))
+        self.loop.run_until_complete(self.harness.run(
+            "describe", _describe, self.REQUEST_COUNT, self.CONCURRENCY))
+        self.loop.run_until_complete(self.harness.run(
+            "load", _load, self.REQUEST_COUNT // 10, self.CONCURRENCY))
+
+        print("Server requests:", dict(self.server.request_counts))
+        self.harness.report()
+
+        self.assertEqual(len(self.server.tables["test$0"].rows), self.REQUEST_COUNT // 10 * 1000)
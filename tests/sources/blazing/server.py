@@ -0,0 +1,276 @@
+"""
+Defines a stand-in BlazingDB HTTP server for load testing the connector and import stages
+"""
+
+import asyncio
+import collections
+import csv
+import json
+import logging
+import os.path
+import random
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+from blazingdb.sources.blazing import BlazingConnector
+
+
+LOAD_PATTERN = re.compile(" ".join([
+    r"load data (infile|infilenoskip) (\S+) into table (\S+)",
+    r"fields terminated by '(.*)' enclosed by '(.*)' lines terminated by '(.*)'$"
+]), re.DOTALL)
+
+CREATE_PATTERN = re.compile(r"create table (\S+) \((.*)\)$", re.DOTALL)
+COLUMN_PATTERN = re.compile(r"(\S+) (\w+)(?:\((\d+)\))?")
+
+COUNT_PATTERN = re.compile(r"select count\(\*\) from (\S+)$")
+SELECT_PATTERN = re.compile(r"select (?:top (\d+) )?\* from (\S+)$")
+
+VALUE_PARSERS = {
+    "bool": lambda value: value.lower() in ("1", "true"),
+    "float": float, "double": float,
+    "int": int, "long": int, "short": int
+}
+
+
+class Table(object):
+    """ Stores the columns and rows of a table in the stand-in server """
+
+    # pragma pylint: disable=too-few-public-methods
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.rows = []
+
+    def parse_row(self, row):
+        """ Converts a row of strings into values of the table's column types """
+        values = []
+
+        for (_, datatype, _), value in zip(self.columns, row):
+            parser = VALUE_PARSERS.get(datatype)
+            values.append(parser(value) if parser is not None and value else value or None)
+
+        return values
+
+
+class FakeBlazingServer(object):
+    """ Implements the register, query and get-results endpoints of BlazingDB in memory """
+
+    # pragma pylint: disable=too-many-instance-attributes
+
+    DEFAULT_PASSWORD = "password"
+
+    def __init__(self, upload_folder, loop=None, **kwargs):
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop if loop is not None else asyncio.get_event_loop()
+
+        self.upload_folder = upload_folder
+        self.password = kwargs.get("password", self.DEFAULT_PASSWORD)
+
+        self.latency = kwargs.get("latency", dict())
+        self.load_rate = kwargs.get("load_rate", None)
+        self.token_ttl = kwargs.get("token_ttl", None)
+
+        self.restart_rate = kwargs.get("restart_rate", 0.0)
+        self.import_warning_rate = kwargs.get("import_warning_rate", 0.0)
+        self.random = random.Random(kwargs.get("seed", None))
+
+        max_concurrency = kwargs.get("max_concurrency", dict())
+        self.semaphores = {
+            path: asyncio.Semaphore(limit, loop=self.loop)
+            for path, limit in max_concurrency.items()}
+
+        self.tables = dict()
+        self.tokens = dict()
+        self.results = dict()
+
+        self.request_counts = collections.Counter()
+
+        self.app = web.Application(loop=self.loop)
+        self.app.router.add_post("/blazing-jdbc/register", self._handle_register)
+        self.app.router.add_post("/blazing-jdbc/query", self._handle_query)
+        self.app.router.add_post("/blazing-jdbc/get-results", self._handle_get_results)
+
+        self.runner = None
+        self.port = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        """ Starts listening for requests, returning the port being listened on """
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+        self.port = self.runner.addresses[0][1]
+        return self.port
+
+    async def stop(self):
+        """ Stops the server """
+        await self.runner.cleanup()
+
+    async def _delay(self, path):
+        latency = self.latency.get(path, 0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            await asyncio.sleep(latency, loop=self.loop)
+
+    async def _limit(self, path, handler, request):
+        self.request_counts[path] += 1
+        data = await request.post()
+
+        semaphore = self.semaphores.get(path)
+        if semaphore is None:
+            await self._delay(path)
+            return await handler(data)
+
+        async with semaphore:
+            await self._delay(path)
+            return await handler(data)
+
+    def _check_token(self, token):
+        expiry = self.tokens.get(token, 0)
+        return expiry is None or expiry > time.monotonic()
+
+    async def _handle_register(self, request):
+        async def _register(data):
+            if data.get("password") != self.password:
+                return web.Response(text="fail")
+
+            token = uuid.uuid4().hex
+            expiry = time.monotonic() + self.token_ttl if self.token_ttl is not None else None
+
+            self.tokens[token] = expiry
+            return web.Response(text=token)
+
+        return await self._limit("register", _register, request)
+
+    async def _handle_query(self, request):
+        async def _query(data):
+            if not self._check_token(data.get("token")):
+                return web.Response(text="fail")
+
+            result_token = uuid.uuid4().hex
+            self.results[result_token] = await self._execute(data.get("query", ""))
+
+            return web.Response(text=result_token)
+
+        return await self._limit("query", _query, request)
+
+    async def _handle_get_results(self, request):
+        async def _get_results(data):
+            results = self.results.pop(data.get("resultSetToken"), None)
+            if results is None or not self._check_token(data.get("token")):
+                results = self._build_error("Invalid token")
+
+            return web.Response(text=json.dumps(results), content_type="application/json")
+
+        return await self._limit("get-results", _get_results, request)
+
+    @staticmethod
+    def _build_results(rows, column_types):
+        return {"status": "success", "rows": rows, "columnTypes": column_types}
+
+    @staticmethod
+    def _build_error(message):
+        return {"status": "fail", "rows": [[message]], "columnTypes": None}
+
+    async def _execute(self, query):
+        """ Executes a statement against the in-memory tables """
+        statement = query.strip()
+
+        if self.random.random() < self.restart_rate:
+            return self._build_error(BlazingConnector.SERVER_RESTART_ERROR)
+
+        try:
+            if statement.startswith("load data"):
+                return await self._load_data(statement)
+
+            return self._execute_statement(statement)
+        except (KeyError, ValueError) as ex:
+            return self._build_error("ERROR: {0}".format(ex))
+
+    def _execute_statement(self, statement):
+        # pragma pylint: disable=too-many-return-statements
+        if statement.startswith("use database"):
+            return self._build_results([], [])
+        elif statement == "list tables":
+            return self._build_results([[name] for name in self.tables], ["string"])
+        elif statement.startswith("describe table"):
+            table = self.tables[statement.split()[-1]]
+            rows = [[name, datatype, size] for name, datatype, size in table.columns]
+            return self._build_results(rows, ["string", "string", "long"])
+        elif statement.startswith("create table"):
+            return self._create_table(statement)
+        elif statement.startswith("drop table"):
+            del self.tables[statement.split()[-1]]
+            return self._build_results([], [])
+        elif statement.startswith("delete from"):
+            self.tables[statement.split()[-1]].rows = []
+            return self._build_results([], [])
+
+        match = COUNT_PATTERN.match(statement)
+        if match is not None:
+            return self._build_results([[len(self.tables[match.group(1)].rows)]], ["long"])
+
+        match = SELECT_PATTERN.match(statement)
+        if match is not None:
+            table = self.tables[match.group(2)]
+            limit = int(match.group(1)) if match.group(1) else None
+
+            column_types = [datatype for _, datatype, _ in table.columns]
+            return self._build_results(table.rows[:limit], column_types)
+
+        raise ValueError("Unsupported statement, {0}".format(statement))
+
+    def _create_table(self, statement):
+        match = CREATE_PATTERN.match(statement)
+        name, definition = match.group(1, 2)
+
+        if name in self.tables:
+            raise ValueError("Table {0} already exists".format(name))
+
+        columns = []
+        for column in definition.split(","):
+            column_name, datatype, size = COLUMN_PATTERN.match(column.strip()).groups()
+            columns.append((column_name, datatype, int(size) if size else None))
+
+        self.tables[name] = Table(columns)
+        return self._build_results([], [])
+
+    async def _load_data(self, statement):
+        """ Parses a file referenced by a load data statement into the table """
+        match = LOAD_PATTERN.match(statement)
+        if match is None:
+            raise ValueError("Invalid load statement, {0}".format(statement))
+
+        _, path, name, field_terminator, field_wrapper, line_terminator = match.groups()
+        table = self.tables[name]
+
+        file_path = os.path.join(self.upload_folder, path)
+        with open(file_path, newline="") as data_file:
+            data = data_file.read()
+
+        if self.load_rate:
+            await asyncio.sleep(len(data) / self.load_rate, loop=self.loop)
+
+        lines = [line for line in data.split(line_terminator) if line]
+        reader = csv.reader(lines, delimiter=field_terminator,
+            quotechar=field_wrapper or None, escapechar="\\", doublequote=False)
+
+        # BlazingDB reports a warning for rows ending in an empty field, but still imports them
+        errors = sum(1 for line in lines if line.endswith(field_terminator))
+
+        for row in reader:
+            if len(row) != len(table.columns):
+                errors += 1
+                continue
+
+            table.rows.append(table.parse_row(row))
+
+        if errors or self.random.random() < self.import_warning_rate:
+            return self._build_error(BlazingConnector.SERVER_IMPORT_WARNING)
+
+        return self._build_results([], [])
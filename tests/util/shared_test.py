@@ -0,0 +1,53 @@
+"""
+Unit tests for the SharedFrame
+"""
+
+import os.path
+import tempfile
+import unittest
+
+import numpy
+import pandas
+
+from blazingdb.pipeline import packets
+from blazingdb.pipeline.stages import load
+from blazingdb.util.shared import SharedFrame
+
+
+class SharedFrameTests(unittest.TestCase):
+    """ Tests frames are read back from shared memory as they were written """
+
+    def setUp(self):
+        self.frame = pandas.DataFrame({
+            "id": numpy.arange(3),
+            "name": ["one", None, "three"],
+            "created": pandas.to_datetime(
+                ["2017-01-01 22:00", None, "2017-01-03 01:00"]).tz_localize("America/New_York"),
+            "kind": pandas.Categorical(["a", "b", "a"])
+        })
+
+    def test_round_trip(self):
+        """ Checks every column, including timezone aware dates, keeps its values and dtype """
+        with SharedFrame.create(self.frame) as handle:
+            frame = handle.read()
+
+        pandas.testing.assert_frame_equal(frame, self.frame)
+
+    def test_write_shared_frame(self):
+        """ Checks timezone aware dates are written the same through shared memory """
+        format_pkt = packets.DataFormatPacket("|", "\n", "\"")
+
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, "frame.dat")
+            shared_path = os.path.join(folder, "shared.dat")
+
+            load.write_frame(self.frame, file_path, format_pkt)
+
+            with SharedFrame.create(self.frame) as handle:
+                load.write_shared_frame(handle, shared_path, format_pkt)
+
+            with open(file_path) as data_file, open(shared_path) as shared_file:
+                data = data_file.read()
+
+                self.assertEqual(shared_file.read(), data)
+                self.assertTrue(data.startswith("0|one|2017-01-01|a\n"))